@@ -0,0 +1,187 @@
+import io
+import json
+import pandas as pd
+from pymongo import MongoClient
+from hdfs import InsecureClient
+from features import DATE_AGGREGATES, EPISODE_AGGREGATES, episode_aggregates, episode_frame, flatten_episodes
+# Index des clés des exports HDFS, partagé avec le scraping (app/ est dans le PYTHONPATH)
+from hdfs_export import KeyIndex
+
+# pyarrow n'est nécessaire que pour lire les tables Parquet (sinon : segments JSON uniquement)
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Chargement des webtoons pour les modèles de prédiction, par morceaux depuis MongoDB ou HDFS.
+# Les colonnes demandées sont des champs des documents ou des agrégats d'épisodes (features.EPISODE_AGGREGATES) :
+# seuls ces champs sont lus, et les épisodes de chaque morceau sont réduits à leurs agrégats dès la lecture.
+# Chaque morceau remplace aussitôt les versions précédentes de ses webtoons : la mémoire dépend de
+# la taille des morceaux et du nombre de webtoons, pas de l'historique des exports ni du volume des épisodes.
+# Sur HDFS, les tables Parquet aplaties (webtoons, episodes) sont lues en priorité, colonne par colonne ;
+# les segments JSON ne servent que pour les exports sans table Parquet (anciens exports, format "json").
+
+MONGO_URI = "mongodb://mongodb:27017"
+MONGO_DB = "webtoons"
+MONGO_COLLECTION = "webtoon_data"
+HDFS_URL = "http://namenode:9870"
+HDFS_DIR = "/webtoons_data"
+HDFS_DATASET = "webtoon_data"
+HDFS_PARQUET_DIR = f"{HDFS_DIR}/{HDFS_DATASET}_parquet"  # Tables <table>/dt=AAAA-MM-JJ/part-HHMMSS-ffffff.parquet
+CHUNK_SIZE = 500  # Webtoons lus par morceau
+KEY_FIELD = "url"
+
+# Documents de webtoon_data par morceaux, avec projection côté serveur
+def iter_mongo_chunks(columns, episode_fields, chunk_size=CHUNK_SIZE):
+    client = MongoClient(MONGO_URI)
+    projection = {column: 1 for column in [KEY_FIELD] + list(columns)}
+    projection.update({f"episodes.{field}": 1 for field in episode_fields})
+    chunk = []
+    try:
+        for doc in client[MONGO_DB][MONGO_COLLECTION].find({}, projection, batch_size=chunk_size):
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk)
+    finally:
+        client.close()
+
+# Fichiers d'un répertoire d'export par segment : {"dt=AAAA-MM-JJ/part-HHMMSS-ffffff": chemin}
+# (le même nom de segment désigne le même export en JSON et dans chaque table Parquet)
+def segment_files(hdfs_client, directory, extension):
+    segments = {}
+    if hdfs_client.status(directory, strict=False):
+        for root, _, files in hdfs_client.walk(directory):
+            for name in files:
+                if name.endswith(extension):
+                    segments[f"{root[len(directory) + 1:]}/{name[:-len(extension)]}"] = f"{root}/{name}"
+    return segments
+
+# Sources du dataset dans l'ordre chronologique : [("json" | "parquet", chemin(s))].
+# L'ancien fichier complet vient en premier ; chaque export est lu depuis ses tables Parquet si
+# elles sont toutes présentes (`tables`), sinon depuis son segment JSON.
+def hdfs_sources(hdfs_client, tables):
+    legacy_path = f"{HDFS_DIR}/{HDFS_DATASET}.json"
+    sources = [("json", legacy_path)] if hdfs_client.status(legacy_path, strict=False) else []
+    json_segments = segment_files(hdfs_client, f"{HDFS_DIR}/{HDFS_DATASET}", ".json")
+    parquet_segments = {table: segment_files(hdfs_client, f"{HDFS_PARQUET_DIR}/{table}", ".parquet") for table in tables} if pq is not None else {}
+    # Les noms de segments sont triables chronologiquement
+    for segment in sorted(set(json_segments).union(*parquet_segments.values())):
+        if parquet_segments and all(segment in paths for paths in parquet_segments.values()):
+            sources.append(("parquet", {table: paths[segment] for table, paths in parquet_segments.items()}))
+        elif segment in json_segments:
+            sources.append(("json", json_segments[segment]))
+    return sources
+
+# Garder d'un document les seuls champs demandés (et, pour les épisodes, les seuls sous-champs utiles)
+def project_record(record, fields, episode_fields):
+    projected = {field: record.get(field) for field in fields}
+    if episode_fields:
+        projected["episodes"] = [{field: episode.get(field) for field in episode_fields} for episode in record.get("episodes") or []]
+    return projected
+
+# Documents d'un segment JSON par morceaux, projetés à la lecture.
+# L'index des clés (hdfs_export.KeyIndex) évite de décoder les versions remplacées : un segment indexé
+# n'est lu que s'il contient encore une version à jour, et seules ses lignes indexées sont décodées.
+# Les fichiers antérieurs à l'index (ancien fichier complet, premiers segments) ne fournissent que les
+# clés absentes de l'index.
+def iter_json_chunks(hdfs_client, path, index, live_offsets, fields, episode_fields, chunk_size):
+    offsets = live_offsets.get(path)
+    if offsets is None and index.covers(path):
+        return  # Toutes les versions de ce segment ont été remplacées
+    columns = [KEY_FIELD] + list(fields) + (["episodes"] if episode_fields else [])
+    records = []
+    with hdfs_client.read(path) as reader:
+        position = 0
+        for line in io.BufferedReader(reader, buffer_size=1 << 20):
+            start, position = position, position + len(line)
+            if (offsets is not None and start not in offsets) or not line.strip():
+                continue
+            record = json.loads(line)
+            if offsets is None and record.get(KEY_FIELD) in index:
+                continue  # Version plus récente dans un segment indexé
+            records.append(project_record(record, [KEY_FIELD] + list(fields), episode_fields))
+            if len(records) >= chunk_size:
+                yield pd.DataFrame(records, columns=columns)
+                records = []
+    if records:
+        yield pd.DataFrame(records, columns=columns)
+
+# Lire les colonnes demandées (et présentes) d'un fichier Parquet de HDFS
+def read_parquet_columns(hdfs_client, path, columns):
+    with hdfs_client.read(path) as reader:
+        parquet_file = pq.ParquetFile(io.BytesIO(reader.read()))
+    present = [column for column in columns if column in parquet_file.schema_arrow.names]
+    return parquet_file.read(columns=present).to_pandas()
+
+# Webtoons d'un export Parquet par morceaux, déjà projetés et agrégés : seules les colonnes utiles
+# des tables webtoons et episodes sont décodées, les agrégats sont calculés sur la table des épisodes.
+def iter_parquet_chunks(hdfs_client, paths, fields, aggregates, chunk_size):
+    webtoons = read_parquet_columns(hdfs_client, paths["webtoons"], [KEY_FIELD] + list(fields))
+    webtoons = webtoons.drop_duplicates(subset=KEY_FIELD, keep="last").reset_index(drop=True)
+    projected = webtoons.reindex(columns=[KEY_FIELD] + list(fields))
+    if "authors" in projected:
+        # Les auteurs sont stockés en JSON dans la table aplatie
+        projected["authors"] = [json.loads(authors) if isinstance(authors, str) else authors for authors in projected["authors"].tolist()]
+    if aggregates:
+        with_dates = any(column in DATE_AGGREGATES for column in aggregates)
+        episode_columns = ["webtoon_url", "position", "like_count"] + (["date"] if with_dates else [])
+        rows = read_parquet_columns(hdfs_client, paths["episodes"], episode_columns)
+        webtoon = pd.Index(projected[KEY_FIELD]).get_indexer(rows["webtoon_url"])
+        rows = rows[webtoon >= 0]
+        episodes = episode_frame(
+            webtoon[webtoon >= 0], rows["position"].to_numpy(), rows["like_count"].to_numpy(),
+            rows["date"].to_numpy(dtype=object) if with_dates else None,
+        )
+        projected = projected.join(episode_aggregates(episodes, projected.index, aggregates))
+    for start in range(0, len(projected), chunk_size):
+        yield projected.iloc[start:start + chunk_size]
+
+# Webtoons de HDFS par morceaux projetés et agrégés, export par export dans l'ordre chronologique
+def iter_hdfs_chunks(fields, aggregates, episode_fields, chunk_size=CHUNK_SIZE):
+    hdfs_client = InsecureClient(HDFS_URL, user="hdfs")
+    index = KeyIndex.load(hdfs_client, HDFS_DIR, HDFS_DATASET)
+    live_offsets = index.live_offsets()
+    tables = ["webtoons", "episodes"] if aggregates else ["webtoons"]
+    for source, paths in hdfs_sources(hdfs_client, tables):
+        if source == "parquet":
+            yield from iter_parquet_chunks(hdfs_client, paths, fields, aggregates, chunk_size)
+        else:
+            for chunk in iter_json_chunks(hdfs_client, paths, index, live_offsets, fields, episode_fields, chunk_size):
+                yield project_chunk(chunk, fields, aggregates)
+
+# Réduire un morceau aux champs demandés et aux agrégats d'épisodes demandés
+def project_chunk(chunk, fields, aggregates):
+    projected = chunk.reindex(columns=[KEY_FIELD] + list(fields))
+    if aggregates:
+        episodes = chunk if "episodes" in chunk else chunk.assign(episodes=None)
+        with_dates = any(column in DATE_AGGREGATES for column in aggregates)
+        projected = projected.join(episode_aggregates(flatten_episodes(episodes, with_dates), chunk.index, aggregates))
+    return projected
+
+# Morceaux projetés et pré-agrégés depuis la source ("mongo" ou "hdfs").
+# Les sous-champs d'épisodes ne sont lus que si un agrégat en a besoin (dates : agrégats de dates seulement).
+def iter_chunks(source, columns, chunk_size=CHUNK_SIZE):
+    fields = [column for column in columns if column not in EPISODE_AGGREGATES and column != KEY_FIELD]
+    aggregates = [column for column in columns if column in EPISODE_AGGREGATES]
+    episode_fields = []
+    if aggregates:
+        episode_fields = ["like_count"] + (["date"] if any(column in DATE_AGGREGATES for column in aggregates) else [])
+    if source == "mongo":
+        for chunk in iter_mongo_chunks(fields, episode_fields, chunk_size):
+            yield project_chunk(chunk, fields, aggregates)
+    elif source == "hdfs":
+        yield from iter_hdfs_chunks(fields, aggregates, episode_fields, chunk_size)
+    else:
+        raise ValueError("Source de données non valide. Utilisez 'mongo' ou 'hdfs'.")
+
+# Charger le dataset projeté : une ligne par webtoon (version la plus récente).
+# Les versions sont dédupliquées au fil des morceaux (les plus récentes sont lues en dernier).
+def load_dataset(source, columns, chunk_size=CHUNK_SIZE):
+    latest = {}
+    for chunk in iter_chunks(source, columns, chunk_size):
+        latest.update(zip(chunk[KEY_FIELD], chunk.to_dict("records")))
+    output_columns = [KEY_FIELD] + [column for column in columns if column != KEY_FIELD]
+    return pd.DataFrame(list(latest.values()), columns=output_columns)
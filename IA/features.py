@@ -0,0 +1,119 @@
+from datetime import datetime
+from itertools import chain
+import numpy as np
+import pandas as pd
+
+# Conversions numériques et dates affichées partagées avec le scraping (app/ est dans le PYTHONPATH)
+from date_fields import parse_display_date
+from number_parsing import parse_count_series, parse_decimal_series
+
+# Construction des features des modèles de prédiction : les épisodes de tous les webtoons sont
+# aplatis une seule fois en une table colonne, puis agrégés par webtoon avec des groupby vectorisés.
+
+RECENT_EPISODES = 10  # Épisodes pris en compte pour les likes récents (les plus récents sont en tête de liste)
+NUMERIC_FEATURES = ["views", "subscribers", "like_count"]
+LIKE_AGGREGATES = ["like_count", "like_sum", "like_max", "recent_like_count"]
+DATE_AGGREGATES = ["cadence_days", "days_since_last_episode"]
+EPISODE_AGGREGATES = LIKE_AGGREGATES + ["episode_count"] + DATE_AGGREGATES
+
+# Convertir les dates d'épisodes affichées par le site en datetime avec le parseur du scraping
+# (date_fields.parse_display_date). Les épisodes d'un même jour partagent la même date :
+# seules les valeurs distinctes sont converties.
+def parse_episode_dates(dates):
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(pd.Series([parse_display_date(value) for value in uniques], dtype=object), errors="coerce")
+    # Le code -1 (date manquante) pointe sur le NaT ajouté en fin de tableau
+    values = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(values[codes], index=dates.index, name=dates.name)
+
+# Table des épisodes attendue par episode_aggregates, à partir de colonnes déjà extraites
+# (tableaux de même longueur) : webtoon, position dans la liste, likes et dates affichées (None : sans dates)
+def episode_frame(webtoon, position, like_count, dates=None):
+    episodes = pd.DataFrame({
+        "webtoon": webtoon,
+        "position": position,
+        "like_count": parse_count_series(pd.Series(like_count)).to_numpy(),
+    })
+    # La conversion des dates est l'étape la plus coûteuse : seulement si un agrégat de dates est demandé
+    if dates is not None:
+        episodes["date"] = parse_episode_dates(pd.Series(dates, dtype=object)).to_numpy()
+    return episodes
+
+# Aplatir les épisodes en une table à une ligne par épisode : webtoon (index de `df`), position
+# dans la liste, likes et, avec `with_dates`, date. Seuls ces champs sont extraits des dictionnaires d'épisodes.
+def flatten_episodes(df, with_dates=True):
+    episode_lists = df["episodes"]
+    lengths = episode_lists.str.len().fillna(0).astype(int).to_numpy()
+    flat = list(chain.from_iterable(episode_lists[lengths > 0]))
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return episode_frame(
+        np.repeat(df.index.to_numpy(), lengths),
+        np.arange(len(flat)) - starts,
+        [episode.get("like_count") for episode in flat],
+        [episode.get("date") for episode in flat] if with_dates else None,
+    )
+
+# Agrégats par webtoon (likes moyens, totaux, récents, nombre d'épisodes, rythme de publication).
+# Seules les colonnes demandées sont calculées ; les agrégats de dates exigent la colonne "date".
+def episode_aggregates(episodes, index, columns=EPISODE_AGGREGATES):
+    grouped = episodes.groupby("webtoon")
+    likes = grouped["like_count"]
+    calculations = {
+        "like_count": likes.mean,
+        "like_sum": likes.sum,
+        "like_max": likes.max,
+        "recent_like_count": lambda: episodes[episodes["position"] < RECENT_EPISODES].groupby("webtoon")["like_count"].mean(),
+        "episode_count": grouped.size,
+    }
+    aggregates = pd.DataFrame({column: calculations[column]() for column in columns if column in calculations}, index=index)
+    if any(column in DATE_AGGREGATES for column in columns):
+        first_date = grouped["date"].min().reindex(index)
+        last_date = grouped["date"].max().reindex(index)
+        episode_count = grouped.size().reindex(index)
+        # Jours moyens entre deux épisodes et ancienneté du dernier épisode
+        aggregates["cadence_days"] = (last_date - first_date).dt.days / (episode_count - 1).where(episode_count > 1)
+        aggregates["days_since_last_episode"] = (pd.Timestamp(datetime.now()) - last_date).dt.days
+    # Sans épisode : 0 like et 0 épisode, comme l'ancien calcul de like_count
+    counted = [column for column in LIKE_AGGREGATES + ["episode_count"] if column in aggregates]
+    aggregates[counted] = aggregates[counted].fillna(0)
+    return aggregates[list(columns)]
+
+# Features numériques (vues, abonnés, agrégats d'épisodes `aggregates`) et note, une ligne par webtoon
+def build_numeric_features(df, aggregates=EPISODE_AGGREGATES):
+    features = pd.DataFrame(index=df.index)
+    features["views"] = parse_count_series(df["views"])
+    features["subscribers"] = parse_count_series(df["subscribers"])
+    features["rating"] = parse_decimal_series(df["rating"])
+    if "episodes" in df:
+        with_dates = any(column in DATE_AGGREGATES for column in aggregates)
+        features[list(aggregates)] = episode_aggregates(flatten_episodes(df, with_dates), df.index, aggregates)
+    else:
+        # Agrégats déjà calculés morceau par morceau au chargement (data_loader.py)
+        for column in aggregates:
+            if column in df:
+                features[column] = df[column]
+    return features
+
+# Matrice prête pour le modèle : X (colonnes `columns`) et y (note), lignes incomplètes écartées
+def numeric_feature_matrix(df, columns=NUMERIC_FEATURES):
+    aggregates = [column for column in columns if column in EPISODE_AGGREGATES]
+    features = build_numeric_features(df, aggregates)[columns + ["rating"]].dropna()
+    return features[columns], features["rating"]
+
+# Concaténer un champ texte des éléments imbriqués (titres d'épisodes, descriptions d'auteurs) par webtoon.
+# Une jointure de chaînes reste une opération Python : une compréhension directe évite le coût d'un groupby.
+def join_nested_text(items, field):
+    return pd.Series(
+        [" ".join(item.get(field) or "" for item in nested) if isinstance(nested, list) else "" for nested in items],
+        index=items.index
+    )
+
+# Features textuelles et catégorielles du modèle de prediction2.py
+def build_text_features(df):
+    features = pd.DataFrame(index=df.index)
+    for column in ["summary", "genre", "title"]:
+        features[column] = df[column].fillna("") if column in df else ""
+    features["author_description"] = join_nested_text(df["authors"], "description") if "authors" in df else ""
+    features["has_qr_code"] = df["qr_code"].fillna("").astype(bool).astype(int) if "qr_code" in df else 0
+    features["rating"] = parse_decimal_series(df["rating"])
+    return features
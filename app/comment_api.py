@@ -0,0 +1,137 @@
+import asyncio
+import aiohttp
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+from date_fields import format_display_date
+from rate_limiter import AdaptiveRateLimiter, get_with_retry
+
+# Récupération des commentaires sans navigateur : le widget de commentaires (classes wcc_)
+# charge ses données depuis l'API JSON "community" de webtoons.com, interrogée ici
+# directement avec une session aiohttp partagée. Les commentaires gardent la forme
+# produite par le scraping Selenium (username, date, content, likes, dislikes, replies).
+
+COMMENT_API_URL = "https://www.webtoons.com/p/api/community/v2"
+COMMENT_API_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+    "Referer": "https://www.webtoons.com/",
+    "Service-Ticket-Id": "epicom",
+}
+COMMENT_API_PAGE_SIZE = 100  # Commentaires demandés par page de l'API
+COMMENT_API_CONCURRENCY = 20  # Requêtes simultanées vers l'API
+COMMENT_API_TIMEOUT = 30  # Délai maximal d'une requête (secondes)
+COMMENT_API_MAX_RETRIES = 4
+
+# Identifiant de page de l'API : w_<title_no>_<episode_no> (Originals) ou c_... (Canvas)
+def comment_page_id(episode_url):
+    parts = urlsplit(episode_url)
+    params = parse_qs(parts.query)
+    title_no = params.get("title_no", [None])[0]
+    episode_no = params.get("episode_no", [None])[0]
+    if not title_no or not episode_no:
+        return None
+    prefix = "c" if "/canvas/" in parts.path or "/challenge/" in parts.path else "w"
+    return f"{prefix}_{title_no}_{episode_no}"
+
+# Date de publication (timestamp en millisecondes ou texte) au format AAAA-MM-JJ,
+# comme les dates affichées relevées par le scraping Selenium
+def format_post_date(value):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000).strftime("%Y-%m-%d")
+    return format_display_date(str(value or ""))
+
+# Compteurs de réactions d'un post : {"like": n, "dislike": n}
+def reaction_counts(post):
+    counts = {}
+    for reaction in post.get("reactions") or []:
+        for emotion in reaction.get("emotions") or []:
+            emotion_id = str(emotion.get("emotionId", "")).lower()
+            counts[emotion_id] = counts.get(emotion_id, 0) + int(emotion.get("count") or 0)
+    return counts
+
+# Convertir un post de l'API en commentaire ou réponse au format du scraping Selenium
+def parse_post(post, with_reactions=True):
+    data = {
+        "username": ((post.get("createdBy") or {}).get("name") or "").strip(),
+        "date": format_post_date(post.get("createdAt")),
+        "content": (post.get("body") or "").strip(),
+    }
+    if with_reactions:
+        counts = reaction_counts(post)
+        data["likes"] = counts.get("like", 0)
+        data["dislikes"] = counts.get("dislike", 0)
+    return data
+
+def create_comment_session():
+    connector = aiohttp.TCPConnector(limit=COMMENT_API_CONCURRENCY, keepalive_timeout=30, ttl_dns_cache=300)
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=COMMENT_API_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=COMMENT_API_TIMEOUT),
+    )
+
+class CommentApiClient:
+    def __init__(self, session, rate_limiter=None, max_retries=COMMENT_API_MAX_RETRIES):
+        self.session = session
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(COMMENT_API_CONCURRENCY)
+
+    # Requête GET renvoyant le champ "result" de la réponse JSON, ou None en cas d'échec
+    async def _get_result(self, url, params):
+        async def handle(response):
+            payload = await response.json(content_type=None)
+            result = payload.get("result") if isinstance(payload, dict) else None
+            if not isinstance(result, dict):
+                print(f"[ERREUR] API commentaires : réponse inattendue pour {params}.")
+                return None
+            return result
+
+        return await get_with_retry(
+            self.session, url, handle, self.rate_limiter.for_url(url), self.max_retries, slot=self.semaphore, params=params
+        )
+
+    # Parcourir toutes les pages d'une liste de posts (limit=None : tous les posts)
+    async def _fetch_posts(self, url, params, limit=None):
+        posts = []
+        cursor = None
+        while limit is None or len(posts) < limit:
+            page_size = COMMENT_API_PAGE_SIZE if limit is None else min(COMMENT_API_PAGE_SIZE, limit - len(posts))
+            page_params = dict(params, prevSize=0, nextSize=page_size, withCursor="true")
+            if cursor:
+                page_params["cursor"] = cursor
+            result = await self._get_result(url, page_params)
+            if result is None:
+                return None
+            page = result.get("posts") or []
+            posts += page
+            cursor = (result.get("pagination") or {}).get("next")
+            if not page or not cursor:
+                break
+        return posts if limit is None else posts[:limit]
+
+    # Réponses d'un commentaire
+    async def fetch_replies(self, post_id, reply_limit=None):
+        posts = await self._fetch_posts(f"{COMMENT_API_URL}/post/{post_id}/child-posts", {"sort": "oldest"}, reply_limit)
+        return None if posts is None else [parse_post(post, with_reactions=False) for post in posts]
+
+    # Commentaires d'un épisode avec leurs réponses, ou None si l'API est inutilisable
+    async def fetch_episode_comments(self, episode_url, comment_limit=None, reply_limit=None):
+        page_id = comment_page_id(episode_url)
+        if page_id is None:
+            return None
+        posts = await self._fetch_posts(f"{COMMENT_API_URL}/posts", {"pageId": page_id, "pinRepresentation": "none"}, comment_limit)
+        if posts is None:
+            return None
+
+        comments = [dict(parse_post(post), replies=[]) for post in posts]
+        if reply_limit is None or reply_limit > 0:
+            # Les réponses ne sont demandées que pour les commentaires qui en ont
+            with_replies = [(comment, post["id"]) for comment, post in zip(comments, posts) if post.get("id") and post.get("childPostCount")]
+            replies = await asyncio.gather(*(self.fetch_replies(post_id, reply_limit) for _, post_id in with_replies))
+            for (comment, _), comment_replies in zip(with_replies, replies):
+                if comment_replies is None:
+                    return None
+                comment["replies"] = comment_replies
+        return comments
@@ -0,0 +1,96 @@
+import re
+from datetime import datetime, timedelta
+from pymongo import MongoClient, UpdateOne
+from mongo_stream import stream_batches
+
+# Champs de fraîcheur (`last_update`) stockés en dates BSON : les sélections du jour
+# deviennent des parcours d'intervalle sur un index ascendant au lieu de `$regex`.
+
+# Formats des anciennes dates stockées en chaînes de caractères
+LEGACY_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+# Dates affichées par le site (épisodes, commentaires) : "5 janv. 2024", "Jan 5, 2024", "2024.01.05"
+MONTHS = {
+    "janv": 1, "févr": 2, "fevr": 2, "mars": 3, "avr": 4, "mai": 5, "juin": 6, "juil": 7,
+    "août": 8, "aout": 8, "sept": 9, "oct": 10, "nov": 11, "déc": 12, "dec": 12,
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7, "aug": 8, "sep": 9,
+}
+DAY_MONTH_YEAR_RE = re.compile(r"(\d{1,2})(?:er)?\s+([^\W\d_]+)\.?\s+(\d{4})")
+MONTH_DAY_YEAR_RE = re.compile(r"([^\W\d_]+)\.?\s+(\d{1,2}),?\s+(\d{4})")
+YEAR_MONTH_DAY_RE = re.compile(r"(\d{4})[-./](\d{1,2})[-./](\d{1,2})")
+
+# Convertir une date (datetime ou ancienne chaîne) en datetime, None si illisible
+def to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    for date_format in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+# Numéro du mois d'un nom abrégé ou complet, français ou anglais ("janv.", "juillet", "Sep")
+def _month_number(name):
+    name = name.lower()
+    return MONTHS.get(name[:4]) or MONTHS.get(name[:3])
+
+# Convertir une date affichée par le site en datetime, None si le texte n'est pas reconnu
+def parse_display_date(text):
+    if not isinstance(text, str):
+        return to_datetime(text)
+    match = YEAR_MONTH_DAY_RE.search(text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    else:
+        match = DAY_MONTH_YEAR_RE.search(text)
+        if match:
+            day, month, year = int(match[1]), _month_number(match[2]), int(match[3])
+        else:
+            match = MONTH_DAY_YEAR_RE.search(text)
+            if match is None:
+                return None
+            month, day, year = _month_number(match[1]), int(match[2]), int(match[3])
+    try:
+        return datetime(year, month, day)
+    except (TypeError, ValueError):
+        return None
+
+# Date affichée au format AAAA-MM-JJ (texte conservé tel quel s'il n'est pas reconnu, ex. "il y a 2 h")
+def format_display_date(text):
+    parsed = parse_display_date(text)
+    return parsed.strftime("%Y-%m-%d") if parsed else (text or "").strip()
+
+# Condition MongoDB sélectionnant une journée entière (aujourd'hui par défaut)
+def day_range(day=None):
+    start = (day or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"$gte": start, "$lt": start + timedelta(days=1)}
+
+# Convertir en dates BSON les valeurs encore stockées en chaînes pour un champ donné
+def migrate_string_dates(collection, field, batch_size=1000):
+    converted = 0
+    for docs_batch in stream_batches(collection, {field: {"$type": "string"}}, {field: 1}, batch_size):
+        bulk_operations = []
+        for doc in docs_batch:
+            value = to_datetime(doc[field])
+            if value is not None:
+                bulk_operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: value}}))
+            else:
+                print(f"[ERREUR] Date illisible pour {collection.name}._id={doc['_id']} : {doc[field]!r}")
+        if bulk_operations:
+            converted += collection.bulk_write(bulk_operations, ordered=False).modified_count
+    print(f"[INFO] {converted} valeur(s) de `{field}` converties en date dans {collection.name}.")
+    return converted
+
+# Migration ponctuelle des collections existantes : python date_fields.py
+if __name__ == "__main__":
+    MONGO_URI = "mongodb://mongodb:27017"
+    MONGO_DB = "webtoons"
+    db = MongoClient(MONGO_URI)[MONGO_DB]
+    for collection_name in ("webtoon_data", "webtoon_comments"):
+        migrate_string_dates(db[collection_name], "last_update")
+        db[collection_name].create_index([("last_update", 1), ("_id", 1)])
+    state = db["export_state"]
+    for doc in state.find({"high_water_mark": {"$type": "string"}}):
+        state.update_one({"_id": doc["_id"]}, {"$set": {"high_water_mark": to_datetime(doc["high_water_mark"])}})
+    print("[INFO] Migration des dates terminée.")
@@ -0,0 +1,122 @@
+import contextlib
+import queue
+import threading
+
+# Pool borné de sessions WebDriver réutilisées entre les épisodes : une session
+# distante coûte plusieurs secondes à ouvrir, bien plus que le scraping d'une page.
+# Chaque session est vérifiée avant d'être prêtée, recyclée après un nombre
+# maximal de pages ou en cas de plantage, et la bannière de cookies n'est
+# acceptée qu'une seule fois par session.
+
+class DriverPool:
+    def __init__(self, create_driver, size=4, max_pages=50, on_first_page=None):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_pages = max_pages
+        self.on_first_page = on_first_page
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        # session_id -> {"pages", "ready"}
+        self.sessions = {}
+        self.stats = {"created": 0, "recycled": 0, "crashed": 0}
+        self.closed = False
+
+    # Vérifier qu'une session répond encore
+    def _is_healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _new_driver(self):
+        driver = self.create_driver()
+        if driver is None:
+            with self.lock:
+                self.created -= 1
+            return None
+        self.sessions[driver.session_id] = {"pages": 0, "ready": False}
+        self.stats["created"] += 1
+        return driver
+
+    # Fermer une session et libérer sa place dans le pool
+    def _discard(self, driver):
+        self.sessions.pop(driver.session_id, None)
+        with self.lock:
+            self.created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    # Emprunter une session (créée à la demande tant que le pool n'est pas plein)
+    def acquire(self, timeout=None):
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_create = self.created < self.size
+                    if can_create:
+                        self.created += 1
+                if can_create:
+                    return self._new_driver()
+                try:
+                    driver = self.idle.get(timeout=timeout)
+                except queue.Empty:
+                    return None
+            if self._is_healthy(driver):
+                return driver
+            print("[INFO] Session Selenium inactive ou plantée, remplacement.")
+            self.stats["crashed"] += 1
+            self._discard(driver)
+
+    # Rendre une session : recyclée si elle a planté ou a atteint max_pages
+    def release(self, driver, broken=False):
+        state = self.sessions.get(driver.session_id)
+        if state is not None:
+            state["pages"] += 1
+        if broken:
+            self.stats["crashed"] += 1
+            self._discard(driver)
+        elif self.closed or state is None or state["pages"] >= self.max_pages:
+            self.stats["recycled"] += 1
+            self._discard(driver)
+        else:
+            self.idle.put(driver)
+
+    # Préparer la session sur sa première page chargée (consentement aux cookies)
+    def prepare(self, driver):
+        state = self.sessions.get(driver.session_id)
+        if state is not None and not state["ready"]:
+            if self.on_first_page is not None:
+                self.on_first_page(driver)
+            state["ready"] = True
+
+    # with pool.session() as driver: ... (session recyclée si une exception remonte)
+    @contextlib.contextmanager
+    def session(self, timeout=None):
+        driver = self.acquire(timeout)
+        if driver is None:
+            raise RuntimeError("Aucune session Selenium disponible.")
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    # Fermer toutes les sessions inactives (celles encore prêtées sont fermées à leur retour)
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        print(f"[INFO] Pool Selenium fermé : {self.stats['created']} session(s) ouverte(s), "
+              f"{self.stats['recycled']} recyclée(s), {self.stats['crashed']} plantée(s).")
@@ -0,0 +1,376 @@
+import contextlib
+import gzip
+import io
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from date_fields import to_datetime
+
+# pyarrow n'est nécessaire que pour le format Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Outils communs aux exports HDFS : fichiers segments datés et point de reprise
+# (high-water mark) persisté dans MongoDB pour n'exporter que les nouveautés.
+
+MONGO_EXPORT_STATE_COLLECTION = "export_state"
+EXPORT_FORMATS = ("json", "parquet", "both")
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 10000
+EXPORT_CHUNK_BYTES = 64 * 1024 * 1024  # Taille maximale (JSON non compressé) d'un fichier de segment découpé
+EXPORT_WRITE_WORKERS = 4  # Fichiers envoyés simultanément vers HDFS
+MANIFEST_DIR = "_manifests"
+KEY_INDEX_PREFIX = "_key_index-v"  # Versions de l'index : _key_index-v00000001.json.gz, _key_index-v00000002.json.gz...
+KEY_INDEX_SUFFIX = ".json.gz"
+LEGACY_KEY_INDEX_FILE = "_key_index.json.gz"  # Ancien index non versionné, supprimé à la première sauvegarde
+
+# Chemin d'un nouveau segment : <HDFS_DIR>/<dataset>/dt=AAAA-MM-JJ/part-HHMMSS-ffffff.<extension>
+# (les noms sont uniques et triables chronologiquement)
+def segment_path(hdfs_dir, dataset, extension="json", exported_at=None):
+    exported_at = exported_at or datetime.now()
+    return f"{hdfs_dir}/{dataset}/dt={exported_at.strftime('%Y-%m-%d')}/part-{exported_at.strftime('%H%M%S-%f')}.{extension}"
+
+# Chemin du manifeste d'un export : <HDFS_DIR>/<dataset>/_manifests/manifest-AAAAMMJJ-HHMMSS-ffffff.json
+def manifest_path(hdfs_dir, dataset, exported_at):
+    return f"{hdfs_dir}/{dataset}/{MANIFEST_DIR}/manifest-{exported_at.strftime('%Y%m%d-%H%M%S-%f')}.json"
+
+# Chemin d'une version de l'index des clés : <HDFS_DIR>/<dataset>/_key_index-vNNNNNNNN.json.gz
+def key_index_path(dataset_dir, version):
+    return f"{dataset_dir}/{KEY_INDEX_PREFIX}{version:08d}{KEY_INDEX_SUFFIX}"
+
+# Index compact des clés exportées (url), stocké à côté des segments JSON : chaque clé pointe vers
+# le segment qui contient sa version la plus récente et la position (octet de début) de sa ligne.
+# Chaque sauvegarde écrit une nouvelle version (fichier temporaire renommé vers un nom inexistant :
+# opération atomique) puis supprime les précédentes ; la version la plus récente fait foi, un export
+# interrompu laisse donc toujours un index complet.
+# Les lecteurs (IA/data_loader.py) ne lisent que les segments encore référencés et n'y décodent
+# que les lignes indexées, sans parcourir les versions remplacées.
+# `since` est le premier segment indexé : les segments plus anciens (exportés avant l'index)
+# ne sont pas couverts et doivent être lus en entier.
+class KeyIndex:
+    def __init__(self, hdfs_dir, dataset, data=None):
+        self.dataset_dir = f"{hdfs_dir}/{dataset}"
+        data = data or {"version": 0, "since": None, "segments": [], "keys": []}
+        self.version = data["version"]
+        self.since = data.get("since")
+        # Chemins des segments, référencés par position dans "keys"
+        self.segments = data["segments"]
+        self.keys = {key: (segment, offset) for key, segment, offset in data["keys"]}
+
+    # Numéros des versions de l'index présentes dans HDFS, de la plus ancienne à la plus récente
+    @staticmethod
+    def stored_versions(hdfs_client, dataset_dir):
+        if hdfs_client.status(dataset_dir, strict=False) is None:
+            return []
+        versions = []
+        for name in hdfs_client.list(dataset_dir):
+            number = name[len(KEY_INDEX_PREFIX):-len(KEY_INDEX_SUFFIX)]
+            if name.startswith(KEY_INDEX_PREFIX) and name.endswith(KEY_INDEX_SUFFIX) and number.isdigit():
+                versions.append(int(number))
+        return sorted(versions)
+
+    # Charger la version la plus récente ; sans index versionné (ancien index non versionné compris),
+    # l'index repart de zéro et les segments existants sont lus en entier
+    @classmethod
+    def load(cls, hdfs_client, hdfs_dir, dataset):
+        index = cls(hdfs_dir, dataset)
+        versions = cls.stored_versions(hdfs_client, index.dataset_dir)
+        if not versions:
+            return index
+        with hdfs_client.read(key_index_path(index.dataset_dir, versions[-1])) as reader:
+            return cls(hdfs_dir, dataset, json.loads(gzip.decompress(reader.read())))
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Le segment a-t-il été exporté depuis la création de l'index (ses clés y sont toutes référencées) ?
+    def covers(self, path):
+        return self.since is not None and path.startswith(f"{self.dataset_dir}/") and path >= self.since
+
+    # Positions des lignes encore à jour, par segment : {chemin: {octet de début, ...}}
+    def live_offsets(self):
+        offsets = {}
+        for segment, offset in self.keys.values():
+            offsets.setdefault(self.segments[segment], set()).add(offset)
+        return offsets
+
+    # Enregistrer un nouveau segment et la position de la ligne de chacune de ses clés
+    def add_segment(self, path, key_offsets):
+        if self.since is None:
+            self.since = path
+        self.segments.append(path)
+        segment = len(self.segments) - 1
+        for key, offset in key_offsets:
+            self.keys[key] = (segment, offset)
+
+    # Sauvegarder l'index trié par clé, sans les segments qui ne contiennent plus aucune version récente
+    def save(self, hdfs_client):
+        live_segments = sorted({segment for segment, _ in self.keys.values()})
+        renumber = {segment: position for position, segment in enumerate(live_segments)}
+        self.segments = [self.segments[segment] for segment in live_segments]
+        self.keys = {key: (renumber[segment], offset) for key, (segment, offset) in self.keys.items()}
+        data = {
+            "version": self.version,
+            "since": self.since,
+            "segments": self.segments,
+            "keys": [[key, segment, offset] for key, (segment, offset) in sorted(self.keys.items())],
+        }
+        path = key_index_path(self.dataset_dir, self.version)
+        hdfs_client.write(f"{path}.tmp", data=gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8")), overwrite=True)
+        # Le renommage WebHDFS n'écrase pas un fichier existant : deux exports concurrents de la même
+        # version échouent au lieu de s'écraser, et la version précédente reste valide
+        hdfs_client.rename(f"{path}.tmp", path)
+        for version in self.stored_versions(hdfs_client, self.dataset_dir):
+            if version < self.version:
+                hdfs_client.delete(key_index_path(self.dataset_dir, version))
+        hdfs_client.delete(f"{self.dataset_dir}/{LEGACY_KEY_INDEX_FILE}")
+
+# Ajouter à l'index un segment JSON validé ([(clé, octet de début de sa ligne)]) sous un nouveau numéro de version.
+# Retourne le nombre de clés ajoutées et remplacées.
+def update_key_index(hdfs_client, hdfs_dir, dataset, path, key_offsets):
+    index = KeyIndex.load(hdfs_client, hdfs_dir, dataset)
+    index.version += 1
+    replaced = sum(1 for key, _ in key_offsets if key in index)
+    index.add_segment(path, key_offsets)
+    index.save(hdfs_client)
+    inserted = len(key_offsets) - replaced
+    print(f"[INFO] Index des clés '{dataset}' : {inserted} ajout(s), {replaced} remplacement(s), version {index.version}, {len(index)} clé(s).")
+    return inserted, replaced
+
+# Lire le point de reprise du dernier export réussi (None si aucun export)
+def load_high_water_mark(db, dataset):
+    state = db[MONGO_EXPORT_STATE_COLLECTION].find_one({"_id": dataset}) or {}
+    return state.get("high_water_mark")
+
+# Enregistrer le point de reprise après un export réussi
+def save_high_water_mark(db, dataset, high_water_mark):
+    db[MONGO_EXPORT_STATE_COLLECTION].update_one(
+        {"_id": dataset},
+        {"$set": {"high_water_mark": high_water_mark, "exported_at": datetime.now()}},
+        upsert=True
+    )
+
+# Schémas Parquet aplatis : une table parent et une table enfant reliée par URL
+if pa is not None:
+    WEBTOON_SCHEMAS = {
+        "webtoons": pa.schema([
+            ("url", pa.string()), ("title", pa.string()), ("genre", pa.string()), ("day_info", pa.string()),
+            ("views", pa.int64()), ("subscribers", pa.int64()), ("rating", pa.float64()),
+            ("episode_count", pa.int32()), ("summary", pa.string()), ("authors", pa.string()),
+            ("cover_image", pa.string()), ("qr_code", pa.string()), ("last_update", pa.timestamp("ms")),
+        ]),
+        "episodes": pa.schema([
+            ("webtoon_url", pa.string()), ("position", pa.int32()), ("episode_url", pa.string()),
+            ("episode_title", pa.string()), ("date", pa.string()), ("like_count", pa.int64()),
+        ]),
+    }
+    COMMENT_SCHEMAS = {
+        "comments": pa.schema([
+            ("episode_url", pa.string()), ("position", pa.int32()), ("username", pa.string()), ("date", pa.string()),
+            ("content", pa.string()), ("likes", pa.int64()), ("dislikes", pa.int64()),
+            ("reply_count", pa.int32()), ("last_update", pa.timestamp("ms")),
+        ]),
+        "replies": pa.schema([
+            ("episode_url", pa.string()), ("comment_position", pa.int32()), ("username", pa.string()),
+            ("date", pa.string()), ("content", pa.string()),
+        ]),
+    }
+else:
+    WEBTOON_SCHEMAS = COMMENT_SCHEMAS = None
+
+# Aplatir un document webtoon en une ligne "webtoons" et une ligne "episodes" par épisode
+def flatten_webtoon(doc):
+    url = doc.get("url")
+    episodes = doc.get("episodes") or []
+    webtoon_row = {
+        "url": url, "title": doc.get("title"), "genre": doc.get("genre"), "day_info": doc.get("day_info"),
+        "views": doc.get("views"), "subscribers": doc.get("subscribers"), "rating": doc.get("rating"),
+        "episode_count": len(episodes), "summary": doc.get("summary"),
+        "authors": json.dumps(doc.get("authors") or [], ensure_ascii=False),
+        "cover_image": doc.get("cover_image"), "qr_code": doc.get("qr_code"),
+        "last_update": to_datetime(doc.get("last_update")),
+    }
+    episode_rows = [
+        {"webtoon_url": url, "position": position, "episode_url": episode.get("url"), "episode_title": episode.get("episode_title"),
+         "date": episode.get("date"), "like_count": episode.get("like_count")}
+        for position, episode in enumerate(episodes)
+    ]
+    return {"webtoons": [webtoon_row], "episodes": episode_rows}
+
+# Aplatir un document de commentaires en lignes "comments" et "replies"
+def flatten_comments(doc):
+    episode_url = doc.get("episode_url")
+    comment_rows, reply_rows = [], []
+    for position, comment in enumerate(doc.get("comments") or []):
+        replies = comment.get("replies") or []
+        comment_rows.append({
+            "episode_url": episode_url, "position": position, "username": comment.get("username"), "date": comment.get("date"),
+            "content": comment.get("content"), "likes": comment.get("likes"), "dislikes": comment.get("dislikes"),
+            "reply_count": len(replies), "last_update": to_datetime(doc.get("last_update")),
+        })
+        reply_rows += [
+            {"episode_url": episode_url, "comment_position": position, "username": reply.get("username"),
+             "date": reply.get("date"), "content": reply.get("content")}
+            for reply in replies
+        ]
+    return {"comments": comment_rows, "replies": reply_rows}
+
+# Écriture d'un fichier Parquet compressé par groupes de lignes, envoyé dans HDFS à la fermeture
+class ParquetSegmentWriter:
+    def __init__(self, schema, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.buffer = io.BytesIO()
+        self.writer = pq.ParquetWriter(self.buffer, schema, compression=PARQUET_COMPRESSION)
+        self.rows = []
+        self.count = 0
+
+    def add(self, rows):
+        self.rows += rows
+        if len(self.rows) >= self.row_group_size:
+            self._flush_rows()
+
+    def _flush_rows(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.count += len(self.rows)
+            self.rows = []
+
+    def upload(self, hdfs_client, hdfs_path):
+        self._flush_rows()
+        self.writer.close()
+        temp_path = f"{hdfs_path}.tmp"
+        hdfs_client.write(temp_path, data=self.buffer.getvalue(), overwrite=True)
+        hdfs_client.rename(temp_path, hdfs_path)
+        return self.count
+
+# Exporter des documents dans un nouveau segment daté, en JSON lignes et/ou en Parquet aplati.
+# Les tables Parquet sont rangées dans <HDFS_DIR>/<dataset>_parquet/<table>/dt=AAAA-MM-JJ/.
+# Retourne le nombre de documents exportés et les chemins écrits.
+# Avec `key_field`, les clés du segment JSON et la position de leur ligne sont ajoutées à l'index
+# du dataset (voir KeyIndex) ; sans segment JSON (format "parquet"), l'index n'est pas mis à jour.
+def export_segment(hdfs_client, hdfs_dir, dataset, docs, export_format="json", flatten=None, schemas=None, key_field=None):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {export_format}")
+    write_json = export_format in ("json", "both")
+    write_parquet = export_format in ("parquet", "both")
+    if write_parquet and pa is None:
+        raise ImportError("pyarrow est requis pour l'export Parquet.")
+
+    exported_at = datetime.now()
+    json_path = segment_path(hdfs_dir, dataset, "json", exported_at)
+    parquet_writers = {table: ParquetSegmentWriter(schema) for table, schema in schemas.items()} if write_parquet else {}
+    key_offsets = []
+    offset = 0
+    count = 0
+    with contextlib.ExitStack() as stack:
+        writer = stack.enter_context(hdfs_client.write(f"{json_path}.tmp", encoding='utf-8', overwrite=True)) if write_json else None
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+            if writer is not None:
+                line = json.dumps(doc, default=str) + "\n"
+                writer.write(line)
+                if key_field:
+                    key_offsets.append((doc.get(key_field), offset))
+                offset += len(line.encode("utf-8"))
+            for table, rows in (flatten(doc).items() if parquet_writers else ()):
+                parquet_writers[table].add(rows)
+            count += 1
+
+    paths = []
+    if write_json:
+        hdfs_client.rename(f"{json_path}.tmp", json_path)
+        paths.append(json_path)
+    for table, parquet_writer in parquet_writers.items():
+        parquet_path = segment_path(hdfs_dir, f"{dataset}_parquet/{table}", "parquet", exported_at)
+        parquet_writer.upload(hdfs_client, parquet_path)
+        paths.append(parquet_path)
+    if key_offsets:
+        update_key_index(hdfs_client, hdfs_dir, dataset, json_path, key_offsets)
+    return count, paths
+
+# Écrire un morceau de segment : JSON lignes compressé en gzip et/ou une table Parquet par table aplatie
+def _write_chunk(hdfs_client, hdfs_dir, dataset, part_name, exported_at, lines, docs, flatten, schemas):
+    files = []
+    if lines is not None:
+        json_path = f"{hdfs_dir}/{dataset}/dt={exported_at.strftime('%Y-%m-%d')}/{part_name}.json.gz"
+        hdfs_client.write(json_path, data=gzip.compress("".join(lines).encode("utf-8")), overwrite=True)
+        files.append({"path": json_path, "format": "json", "records": len(lines)})
+    if schemas:
+        parquet_writers = {table: ParquetSegmentWriter(schema) for table, schema in schemas.items()}
+        for doc in docs:
+            for table, rows in flatten(doc).items():
+                parquet_writers[table].add(rows)
+        for table, parquet_writer in parquet_writers.items():
+            parquet_path = f"{hdfs_dir}/{dataset}_parquet/{table}/dt={exported_at.strftime('%Y-%m-%d')}/{part_name}.parquet"
+            files.append({"path": parquet_path, "format": "parquet", "table": table, "records": parquet_writer.upload(hdfs_client, parquet_path)})
+    return files
+
+# Exporter des documents en plusieurs fichiers de taille bornée, envoyés en parallèle, puis valider
+# l'ensemble en écrivant un manifeste (fichier temporaire renommé : opération atomique).
+# Seuls les fichiers listés dans un manifeste font partie du dataset : un export interrompu ne laisse
+# que des fichiers absents de tout manifeste, qu'un lecteur doit ignorer. Les exports précédents ne
+# sont jamais relus ni réécrits.
+# Retourne le nombre de documents exportés et le chemin du manifeste (None si aucun document).
+def export_chunked_segment(hdfs_client, hdfs_dir, dataset, docs, export_format="json", flatten=None, schemas=None,
+                           chunk_bytes=EXPORT_CHUNK_BYTES, workers=EXPORT_WRITE_WORKERS):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {export_format}")
+    write_json = export_format in ("json", "both")
+    write_parquet = export_format in ("parquet", "both")
+    if write_parquet and pa is None:
+        raise ImportError("pyarrow est requis pour l'export Parquet.")
+
+    exported_at = datetime.now()
+    prefix = f"part-{exported_at.strftime('%H%M%S-%f')}"
+    files, pending = [], set()
+    chunk_docs, chunk_lines, chunk_size, chunk_number = [], [], 0, 0
+    count = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_chunk(chunk_number):
+            # Au plus `workers` morceaux en mémoire en attente d'envoi
+            while len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    files.extend(future.result())
+            part_name = f"{prefix}-{chunk_number:05d}"
+            pending.add(executor.submit(
+                _write_chunk, hdfs_client, hdfs_dir, dataset, part_name, exported_at,
+                chunk_lines if write_json else None, chunk_docs, flatten, schemas if write_parquet else None
+            ))
+
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+            line = json.dumps(doc, default=str) + "\n"
+            chunk_docs.append(doc)
+            chunk_lines.append(line)
+            chunk_size += len(line)
+            count += 1
+            if chunk_size >= chunk_bytes:
+                submit_chunk(chunk_number)
+                chunk_docs, chunk_lines, chunk_size, chunk_number = [], [], 0, chunk_number + 1
+        if chunk_docs:
+            submit_chunk(chunk_number)
+        for future in pending:
+            files.extend(future.result())
+
+    if count == 0:
+        return 0, None
+    manifest = {
+        "dataset": dataset,
+        "exported_at": exported_at.isoformat(),
+        "records": count,
+        "files": sorted(files, key=lambda f: f["path"]),
+    }
+    path = manifest_path(hdfs_dir, dataset, exported_at)
+    hdfs_client.write(f"{path}.tmp", data=json.dumps(manifest, ensure_ascii=False), encoding="utf-8", overwrite=True)
+    hdfs_client.rename(f"{path}.tmp", path)
+    return count, path
@@ -0,0 +1,267 @@
+import glob
+import math
+import os
+import re
+import sys
+from bs4 import BeautifulSoup
+from number_parsing import parse_count, parse_decimal
+
+# Moteurs de parsing HTML disponibles, du plus rapide au plus lent.
+# "auto" choisit le premier installé ; BeautifulSoup reste le moteur de repli.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    import cssselect  # Requis par lxml pour les sélecteurs CSS
+except ImportError:
+    lxml = None
+
+PARSER_BACKEND = "auto"  # "auto", "selectolax", "lxml" ou "bs4"
+# Version du format des résultats de parsing, à incrémenter à chaque changement de sortie
+# des parseurs (ou des conversions de number_parsing) : invalide les résultats du cache HTTP
+PARSER_VERSION = 3
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")  # Pages de référence du contrôle de parité
+
+# Moteur selectolax (lexbor, écrit en C)
+class SelectolaxBackend:
+    name = "selectolax"
+
+    def parse(self, html):
+        return LexborHTMLParser(html)
+
+    def select(self, node, css):
+        return node.css(css)
+
+    def select_one(self, node, css):
+        return node.css_first(css)
+
+    def text(self, node):
+        return node.text()
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+# Moteur lxml (libxml2) avec sélecteurs CSS via cssselect
+class LxmlBackend:
+    name = "lxml"
+
+    def parse(self, html):
+        return lxml.html.document_fromstring(html)
+
+    def select(self, node, css):
+        return node.cssselect(css)
+
+    def select_one(self, node, css):
+        matches = node.cssselect(css)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        return node.text_content()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+# Moteur BeautifulSoup (pur Python), toujours disponible
+class BeautifulSoupBackend:
+    name = "bs4"
+
+    def parse(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def select(self, node, css):
+        return node.select(css)
+
+    def select_one(self, node, css):
+        return node.select_one(css)
+
+    def text(self, node):
+        return node.text
+
+    def attr(self, node, name):
+        return node.get(name)
+
+BACKENDS = {
+    "selectolax": SelectolaxBackend if LexborHTMLParser is not None else None,
+    "lxml": LxmlBackend if lxml is not None else None,
+    "bs4": BeautifulSoupBackend,
+}
+
+# Liste des moteurs installés
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend is not None]
+
+# Retourner le moteur demandé, ou le plus rapide disponible en mode "auto"
+def get_backend(name=None):
+    name = name or PARSER_BACKEND
+    if name == "auto":
+        name = available_backends()[0]
+    backend = BACKENDS.get(name)
+    if backend is None:
+        print(f"[ERREUR] Moteur de parsing '{name}' indisponible, utilisation de BeautifulSoup.")
+        backend = BeautifulSoupBackend
+    return backend()
+
+# Texte nettoyé du premier élément correspondant (sélecteur évalué une seule fois)
+def select_text(backend, node, css):
+    element = backend.select_one(node, css)
+    return backend.text(element).strip() if element is not None else ""
+
+# Attribut du premier élément correspondant (sélecteur évalué une seule fois)
+def select_attr(backend, node, css, name):
+    element = backend.select_one(node, css)
+    return (backend.attr(element, name) or "") if element is not None else ""
+
+# Extraire le numéro de page d'une URL de pagination
+def get_page_number(url):
+    match = re.search(r"page=(\d+)", url)
+    return int(match.group(1)) if match else 1
+
+# Déterminer le numéro de la dernière page à partir d'une page de liste d'épisodes
+def get_last_page_number(backend, doc, episode_items):
+    last_page = 1
+    for link in backend.select(doc, "div.paginate a"):
+        page_url = backend.attr(link, "href")
+        if page_url and "page=" in page_url:
+            last_page = max(last_page, get_page_number(page_url))
+
+    # Le premier épisode de la page 1 porte le numéro le plus élevé (#N), ce qui donne
+    # le nombre total de pages sans parcourir les fenêtres de pagination une à une
+    if episode_items:
+        match = re.search(r"\d+", select_text(backend, episode_items[0], "span.tx"))
+        if match:
+            last_page = max(last_page, math.ceil(int(match.group()) / len(episode_items)))
+    return last_page
+
+# Extraire les épisodes d'une page de la liste d'épisodes
+def parse_episode_items(backend, episode_items):
+    episodes = []
+    for episode in episode_items:
+        like_count = parse_count(select_text(backend, episode, "span.like_area"), 0)
+
+        episodes.append({
+            'episode_title': backend.text(backend.select_one(episode, "span.subj span")).strip(),
+            'date': backend.text(backend.select_one(episode, "span.date")).strip(),
+            'like_count': like_count,
+            'url': backend.attr(backend.select_one(episode, "a"), "href")
+        })
+    return episodes
+
+# Parser une page de la liste d'épisodes : numéro de la dernière page et épisodes
+def parse_episode_page(html, backend=None):
+    backend = backend or get_backend()
+    doc = backend.parse(html)
+    episode_items = backend.select(doc, "ul#_listUl li._episodeItem")
+    return {"last_page": get_last_page_number(backend, doc, episode_items), "episodes": parse_episode_items(backend, episode_items)}
+
+# Parser la page des genres : liste des (url, nom) de chaque genre
+def parse_genre_links(html, backend=None):
+    backend = backend or get_backend()
+    doc = backend.parse(html)
+    return [(backend.attr(genre, "href"), backend.text(genre).strip().lower()) for genre in backend.select(doc, "ul.snb._genre li a")]
+
+# Parser une page de genre : URLs des webtoons listés
+def parse_webtoon_cards(html, backend=None):
+    backend = backend or get_backend()
+    doc = backend.parse(html)
+    return [backend.attr(card, "href") for card in backend.select(doc, "ul.card_lst li a")]
+
+# Parser la page de détails d'un webtoon avec conversion des données numériques
+def parse_webtoon_details(html, backend=None):
+    backend = backend or get_backend()
+    doc = backend.parse(html)
+    webtoon_info = {}
+
+    try:
+        webtoon_info['title'] = select_text(backend, doc, "h1.subj")
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le titre: {e}")
+
+    try:
+        webtoon_info['cover_image'] = select_attr(backend, doc, "span.thmb img", "src")
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer l'image de couverture: {e}")
+
+    try:
+        webtoon_info['genre'] = select_text(backend, doc, "h2.genre")
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le genre: {e}")
+
+    try:
+        authors_info = []
+        for section in backend.select(doc, "div.ly_creator_in"):
+            name = select_text(backend, section, "h3.title")
+            desc = select_text(backend, section, "p.desc")
+            authors_info.append({"name": name, "description": desc})
+
+        webtoon_info['authors'] = authors_info
+
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer les informations des auteurs: {e}")
+
+    try:
+        # Extraire les vues et les convertir en entier
+        views_str = select_text(backend, doc, "ul.grade_area li span.ico_view + em")
+        webtoon_info['views'] = parse_count(views_str, 0)
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le nombre de vues: {e}")
+
+    try:
+        # Extraire les abonnés et les convertir en entier
+        subscribers_str = select_text(backend, doc, "ul.grade_area li span.ico_subscribe + em")
+        webtoon_info['subscribers'] = parse_count(subscribers_str, 0)
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le nombre d'abonnés: {e}")
+
+    try:
+        # Extraire la note et la convertir en float
+        rating_str = select_text(backend, doc, "ul.grade_area li span.ico_grade5 + em")
+        webtoon_info['rating'] = parse_decimal(rating_str, 0.0)
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer la note: {e}")
+
+    try:
+        webtoon_info['summary'] = select_text(backend, doc, "p.summary")
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le résumé: {e}")
+
+    try:
+        webtoon_info['day_info'] = select_text(backend, doc, "p.day_info")
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le jour de publication: {e}")
+
+    # Récupérer le QR code
+    try:
+        qr_code_src = select_attr(backend, doc, "div.detail_install_app img.img_qrcode", "src")
+        webtoon_info['qr_code'] = f"https://www.webtoons.com{qr_code_src}" if qr_code_src.startswith("/") else qr_code_src
+    except Exception as e:
+        print(f"[Erreur] Impossible de récupérer le QR code: {e}")
+
+    return webtoon_info
+
+# Vérifier que tous les moteurs installés extraient exactement les mêmes données, sur les pages
+# enregistrées de fixtures/html/ (page de détails = page 1 de la liste d'épisodes, page de genres)
+# ou sur les pages passées en argument.
+# Usage : python html_parsing.py [page_webtoon.html ...]
+if __name__ == "__main__":
+    parsers = [parse_webtoon_details, parse_episode_page, parse_genre_links, parse_webtoon_cards]
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+    if not paths:
+        print(f"[ERREUR] Aucune page à comparer dans {FIXTURES_DIR}.")
+        sys.exit(1)
+    all_identical = True
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        for parser in parsers:
+            results = {name: parser(html, BACKENDS[name]()) for name in available_backends()}
+            reference = results["bs4"]
+            for name, result in results.items():
+                if result != reference:
+                    all_identical = False
+                    print(f"[ERREUR] {path} : {parser.__name__} diffère entre '{name}' et 'bs4'.")
+    print(f"[INFO] Moteurs comparés : {', '.join(available_backends())} sur {len(paths)} page(s).")
+    print("[INFO] Résultats identiques pour tous les moteurs." if all_identical else "[ERREUR] Des différences ont été trouvées.")
+    sys.exit(0 if all_identical else 1)
@@ -0,0 +1,195 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Cache HTTP sur disque : corps des réponses + validateurs (ETag / Last-Modified),
+# résultats de parsing associés au hash du corps, taille bornée avec éviction LRU.
+# Les résultats de parsing portent la version des parseurs : une nouvelle version les invalide.
+# get_parsed / set_parsed (décodage et écriture JSON) peuvent être appelés depuis des threads pendant
+# que la boucle asyncio utilise le reste du cache : l'index en mémoire est protégé par un verrou tenu
+# brièvement, jamais pendant une lecture ou une écriture de fichier.
+
+INDEX_FILE = "index.json"
+
+# Calculer le hash d'un corps de réponse
+def hash_body(body):
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+class HttpCache:
+    def __init__(self, cache_dir, max_bytes, parser_version=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.parser_version = parser_version
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        # url -> {"key", "etag", "last_modified", "hash", "size"}, du moins au plus récemment utilisé
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "unchanged": 0, "parse_skipped": 0, "evictions": 0}
+        self.lock = threading.RLock()  # Index en mémoire (entries, total_bytes, stats)
+        self.parsed_lock = threading.Lock()  # Lecture-modification-écriture des fichiers de résultats de parsing
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    # Charger l'index persistant (ordre LRU conservé)
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                for url, entry in json.load(f):
+                    if os.path.exists(self._body_path(entry["key"])):
+                        self.entries[url] = entry
+                        self.total_bytes += entry["size"]
+        except Exception as e:
+            print(f"[ERREUR] Index du cache HTTP illisible, cache réinitialisé : {e}")
+            self.entries.clear()
+            self.total_bytes = 0
+
+    # Sauvegarder l'index (à appeler en fin d'exécution)
+    def save(self):
+        temp_path = f"{self.index_path}.tmp"
+        with self.lock:
+            entries = list(self.entries.items())
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(temp_path, self.index_path)
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.html")
+
+    def _parsed_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # En-têtes de revalidation conditionnelle pour une URL déjà en cache
+    def validators(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    # Lire le corps en cache après une réponse 304 Not Modified
+    def load(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        try:
+            with open(self._body_path(entry["key"]), encoding="utf-8") as f:
+                body = f.read()
+        except OSError:
+            with self.lock:
+                self._remove(url)
+            return None
+        with self.lock:
+            if url in self.entries:
+                self.entries.move_to_end(url)
+            self.stats["hits"] += 1
+        return body
+
+    # Enregistrer une réponse 200 avec ses validateurs
+    def store(self, url, body, etag=None, last_modified=None):
+        body_hash = hash_body(body)
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and entry["hash"] == body_hash:
+                # Corps identique : seuls les validateurs sont mis à jour, les résultats de parsing restent valides
+                self.stats["unchanged"] += 1
+                entry["etag"] = etag
+                entry["last_modified"] = last_modified
+                self.entries.move_to_end(url)
+                return body_hash
+
+            self.stats["misses"] += 1
+            if entry is not None:
+                self._remove(url)
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with open(self._body_path(key), "w", encoding="utf-8") as f:
+            f.write(body)
+        size = len(body.encode("utf-8"))
+        with self.lock:
+            self.entries[url] = {"key": key, "etag": etag, "last_modified": last_modified, "hash": body_hash, "size": size}
+            self.total_bytes += size
+            self._evict()
+        return body_hash
+
+    # Résultat de parsing mémorisé pour ce corps, ou None s'il faut reparser
+    def get_parsed(self, url, parser_name, body_hash):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None or entry["hash"] != body_hash:
+                return None
+            key = entry["key"]
+        try:
+            with open(self._parsed_path(key), encoding="utf-8") as f:
+                parsed = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if parsed.get("hash") != body_hash or parsed.get("version") != self.parser_version or parser_name not in parsed["results"]:
+            return None
+        with self.lock:
+            self.stats["parse_skipped"] += 1
+        return parsed["results"][parser_name]
+
+    # Mémoriser un résultat de parsing (doit être sérialisable en JSON)
+    def set_parsed(self, url, parser_name, body_hash, result):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None or entry["hash"] != body_hash:
+                return
+        path = self._parsed_path(entry["key"])
+        parsed = {"hash": body_hash, "version": self.parser_version, "results": {}}
+        # Les parseurs d'une même page (détails, liste d'épisodes) peuvent écrire en même temps
+        with self.parsed_lock:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    existing = json.load(f)
+                # Les résultats d'une autre version des parseurs sont remplacés
+                if existing.get("hash") == body_hash and existing.get("version") == self.parser_version:
+                    parsed = existing
+            except (OSError, ValueError):
+                pass
+            parsed["results"][parser_name] = result
+            data = json.dumps(parsed)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        with self.lock:
+            # L'entrée a pu être remplacée ou évincée pendant l'écriture : le fichier d'une entrée
+            # évincée est supprimé, celui d'une entrée remplacée ne correspond plus à son hash
+            if self.entries.get(url) is not entry:
+                if url not in self.entries:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                return
+            self.total_bytes += len(data) - entry.get("parsed_size", 0)
+            entry["size"] += len(data) - entry.get("parsed_size", 0)
+            entry["parsed_size"] = len(data)
+            self._evict()
+
+    def _remove(self, url):
+        entry = self.entries.pop(url)
+        self.total_bytes -= entry["size"]
+        for path in (self._body_path(entry["key"]), self._parsed_path(entry["key"])):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Supprimer les entrées les moins récemment utilisées au-delà de la taille maximale (verrou tenu)
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            url = next(iter(self.entries))
+            self._remove(url)
+            self.stats["evictions"] += 1
+
+    # Afficher les compteurs du cache
+    def report(self):
+        print(f"[INFO] Cache HTTP : {self.stats['hits']} hit(s) 304, {self.stats['unchanged']} corps inchangé(s), "
+              f"{self.stats['misses']} miss, {self.stats['parse_skipped']} parsing(s) évité(s), "
+              f"{self.stats['evictions']} éviction(s), {len(self.entries)} entrée(s), {self.total_bytes / 1e6:.1f} Mo.")
@@ -9,8 +9,8 @@ scheduler = BlockingScheduler()
 
 def run_comment_update():
     print(f"[INFO] Début de la mise à jour des commentaires à {datetime.now()}")
-    fetch_comments_for_all_episodes(batch_size=50, comment_limit=5, reply_limit=5)
-    transfer_updated_comments_to_hdfs(batch_size=20)
+    fetch_comments_for_all_episodes(batch_size=50, comment_limit=None, reply_limit=None)
+    asyncio.run(transfer_updated_comments_to_hdfs(batch_size=20))
     print(f"[INFO] Fin de la mise à jour des commentaires et transfert vers HDFS à {datetime.now()}")
 
 def run_extraction():
@@ -20,7 +20,7 @@ def run_extraction():
         genres_url="https://www.webtoons.com/fr/genres",
         # webtoon_limit=2,
         batch_size=20,
-        instance_limit=20  # Nombre maximum de tâches simultanées
+        instance_limit=20  # Nombre maximum de requêtes HTTP simultanées
         # day_filter="LUNDI"
     ))
     print(f"[INFO] Fin de l'extraction des webtoons à {datetime.now()}")
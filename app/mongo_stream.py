@@ -0,0 +1,39 @@
+# Lecture en flux des collections MongoDB par pagination keyset.
+# Chaque lot reprend après la dernière clé lue : pas de `skip` qui relit la collection
+# depuis le début, et les documents écrits pendant la lecture ne sont ni sautés ni dupliqués.
+# Avec `sort_field` (ex. "last_update" pour une sélection par intervalle de dates), la clé est
+# (sort_field, _id) : chaque lot est un parcours de l'index composé {sort_field: 1, _id: 1}
+# qui reprend là où le précédent s'est arrêté, au lieu de relire et retrier tout l'intervalle restant.
+
+# Parcourir une collection par lots de `batch_size` documents
+def stream_batches(collection, query=None, projection=None, batch_size=1000, sort_field=None):
+    query = query or {}
+    if projection is not None:
+        # `_id` et `sort_field` sont indispensables pour reprendre la lecture après le dernier document
+        projection = {key: value for key, value in projection.items() if key != "_id" or value}
+        if sort_field and any(projection.values()):
+            projection[sort_field] = 1
+    sort = [(sort_field, 1), ("_id", 1)] if sort_field else [("_id", 1)]
+    last_key = None
+    while True:
+        page_query = query if last_key is None else {"$and": [query, _after(last_key, sort_field)]}
+        batch = list(collection.find(page_query, projection).sort(sort).limit(batch_size))
+        if not batch:
+            return
+        # Lu avant de céder le lot : l'appelant peut modifier les documents (ex. `_id` converti en chaîne)
+        last_key = (batch[-1].get(sort_field) if sort_field else None, batch[-1]["_id"])
+        yield batch
+        if len(batch) < batch_size:
+            return
+
+# Condition "après la clé (valeur, _id)" dans l'ordre du tri
+def _after(last_key, sort_field):
+    value, last_id = last_key
+    if not sort_field:
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{sort_field: {"$gt": value}}, {sort_field: value, "_id": {"$gt": last_id}}]}
+
+# Parcourir une collection document par document (mémoire bornée par `batch_size`)
+def stream_documents(collection, query=None, projection=None, batch_size=1000, sort_field=None):
+    for batch in stream_batches(collection, query, projection, batch_size, sort_field):
+        yield from batch
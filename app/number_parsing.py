@@ -0,0 +1,133 @@
+import random
+import re
+import sys
+import time
+
+# Conversion des nombres affichés par webtoons.com en valeurs numériques, partagée par le
+# scraping (valeurs une à une) et par l'IA (colonnes pandas entières) :
+#   "1,2 M" / "1.2M" -> 1200000, "950 K" -> 950000, "3,4 B" -> 3400000000,
+#   "12 345" (espace, espace insécable ou fine) / "12,345" -> 12345, "9,87" -> 9.87.
+# Avec un suffixe, la virgule ou le point est le séparateur décimal ; sans suffixe, un
+# compteur est entier et tous les séparateurs sont des séparateurs de milliers.
+
+MULTIPLIERS = {"K": 1e3, "M": 1e6, "B": 1e9, "k": 1e3, "m": 1e6, "b": 1e9}
+
+# Premier nombre du texte (terminé par un chiffre), suivi d'un éventuel suffixe K/M/B isolé :
+# "like 1,2K" -> ("1,2", "K"), "12 345 vues" -> ("12 345", None)
+COUNT_RE = re.compile(r"(\d(?:[\d\s\u00a0\u202f.,]*\d)?)\s*([KMB])?(?![A-Za-z])", re.IGNORECASE)
+NON_DIGITS_RE = re.compile(r"\D")
+
+# Supprimer les espaces, y compris insécables (str.replace est plus rapide que str.translate ici)
+def _strip_spaces(text):
+    return text.replace(" ", "").replace("\xa0", "").replace("\u202f", "")
+
+# Compteur (vues, abonnés, likes) en entier, `default` si le texte ne contient aucun nombre
+def parse_count(text, default=None):
+    if text.__class__ is not str:
+        return default if text is None else int(text)
+    # Cas courant sans libellé ("1,2 M", "12 345") : sans regex
+    compact = _strip_spaces(text)
+    try:
+        if compact[-1:].isdigit():
+            return int(compact.replace(",", "").replace(".", ""))
+        return int(round(float(compact[:-1].replace(",", ".")) * MULTIPLIERS[compact[-1]]))
+    except (ValueError, KeyError, IndexError):
+        pass
+    match = COUNT_RE.search(text)
+    if match is None:
+        return default
+    number, suffix = match.groups()
+    if suffix is None:
+        return int(NON_DIGITS_RE.sub("", number))
+    return int(round(float(_strip_spaces(number).replace(",", ".")) * MULTIPLIERS[suffix]))
+
+# Nombre décimal (note) en float, `default` si le texte n'est pas un nombre
+def parse_decimal(text, default=None):
+    if text.__class__ is not str:
+        return default if text is None else float(text)
+    try:
+        return float(_strip_spaces(text).replace(",", "."))
+    except ValueError:
+        return default
+
+# Appliquer un parseur à une colonne pandas : chaque valeur distincte n'est convertie qu'une fois
+# (factorisation), les valeurs déjà numériques sont conservées et les échecs deviennent NaN.
+def _parse_series(series, parser):
+    import numpy as np
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series)
+    # tolist() : itérer directement un tableau de chaînes Arrow (pandas 3) est bien plus lent
+    values = np.array([np.nan if (value := parser(unique)) is None else value for unique in uniques.tolist()] + [np.nan], dtype="float64")
+    # Le code -1 (valeur manquante) pointe sur le NaN ajouté en fin de tableau
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+# Version vectorisée de parse_count pour une colonne pandas
+def parse_count_series(series):
+    return _parse_series(series, parse_count)
+
+# Version vectorisée de parse_decimal pour une colonne pandas
+def parse_decimal_series(series):
+    return _parse_series(series, parse_decimal)
+
+# Micro-benchmark contre les anciennes conversions (chaînes de str.replace et regex non compilée)
+# Usage : python number_parsing.py [nombre_de_valeurs]
+def benchmark(size=200000):
+    def legacy_convert_views(view_str):
+        view_str = view_str.replace('\xa0', ' ').replace(' ', '').strip()
+        if 'M' in view_str:
+            return int(float(view_str.replace('M', '').replace(',', '.')) * 1e6)
+        elif 'K' in view_str:
+            return int(float(view_str.replace('K', '').replace(',', '.')) * 1e3)
+        else:
+            return int(view_str.replace(',', ''))
+
+    def legacy_like_count(like_count_text):
+        return int(re.sub(r'[^\d]', '', like_count_text))
+
+    def legacy_convert_rating(rating_str):
+        return float(rating_str.replace(',', '.').strip())
+
+    # Valeurs au format affiché par le site, tirées au hasard (peu de doublons, comme les likes réels)
+    rng = random.Random(42)
+    views = [rng.choice([f"{rng.randint(10, 999)},{rng.randint(1, 9)}\xa0M", f"{rng.randint(100, 999)},{rng.randint(1, 9)}\xa0K",
+                         f"{rng.randint(1, 99)}\xa0{rng.randint(100, 999)}"]) for _ in range(size)]
+    likes = [f"{rng.randint(1, 99)},{rng.randint(100, 999)}" for _ in range(size)]
+    ratings = [f"{rng.randint(1, 9)},{rng.randint(10, 99)}" for _ in range(size)]
+    samples = {
+        "vues": (views, legacy_convert_views, parse_count, parse_count_series),
+        "likes": (likes, legacy_like_count, parse_count, parse_count_series),
+        "notes": (ratings, legacy_convert_rating, parse_decimal, parse_decimal_series),
+    }
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    for name, (values, legacy, scalar, vectorized) in samples.items():
+        timings = {}
+        started_at = time.perf_counter()
+        expected = [legacy(value) for value in values]
+        timings["ancienne"] = time.perf_counter() - started_at
+        started_at = time.perf_counter()
+        results = [scalar(value) for value in values]
+        timings["nouvelle"] = time.perf_counter() - started_at
+        # L'ancienne conversion tronquait le produit flottant ("123,7 K" -> 123699), la nouvelle l'arrondit
+        differences = sum(1 for result, reference in zip(results, expected) if result != reference)
+        if any(abs(result - reference) > 1 for result, reference in zip(results, expected)):
+            print(f"[ERREUR] {name} : résultats différents des anciennes conversions.")
+        elif differences:
+            print(f"[INFO] {name} : {differences} valeur(s) corrigée(s) d'une unité (troncature de l'ancienne conversion).")
+        if pd is not None:
+            series = pd.Series(values, dtype=object)
+            started_at = time.perf_counter()
+            series.apply(legacy)
+            timings["ancienne (Series.apply)"] = time.perf_counter() - started_at
+            started_at = time.perf_counter()
+            vectorized(series)
+            timings["nouvelle (colonne)"] = time.perf_counter() - started_at
+        print(f"[INFO] {name} ({len(values)} valeurs) : " + ", ".join(f"{label} {seconds * 1000:.0f} ms" for label, seconds in timings.items()))
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
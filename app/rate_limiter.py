@@ -0,0 +1,147 @@
+import asyncio
+import aiohttp
+import contextlib
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Limiteur de débit adaptatif par hôte : seau à jetons dont le débit augmente
+# progressivement tant que l'hôte répond vite et sans erreur, et diminue
+# fortement dès qu'il ralentit ou renvoie 429/503 (AIMD).
+# `get_with_retry` applique la même politique de nouvelles tentatives à toutes les requêtes HTTP.
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+RETRY = object()  # Renvoyé par le `handle` de get_with_retry pour relancer aussitôt la requête
+
+# Délai d'attente avant une nouvelle tentative : backoff exponentiel avec jitter complet
+def backoff_delay(attempt, base=1, cap=60):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Convertir l'en-tête Retry-After (secondes ou date HTTP) en nombre de secondes
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class HostRateLimiter:
+    def __init__(self, rate, min_rate, max_rate, burst, latency_target):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.latency_target = latency_target
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return now
+
+    # Attendre un jeton (et la fin d'une éventuelle pause demandée par Retry-After)
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self._refill()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    # Réponse rapide et valide : augmentation additive du débit, réduction si la latence se dégrade
+    def on_success(self, latency):
+        if latency > self.latency_target:
+            self.rate = max(self.min_rate, self.rate * 0.9)
+        else:
+            self.rate = min(self.max_rate, self.rate + 0.5)
+
+    # 429/503 : réduction multiplicative du débit et pause de tout l'hôte si Retry-After est fourni
+    def on_throttle(self, retry_after=None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    # Erreur réseau ou 5xx : réduction modérée du débit
+    def on_error(self):
+        self.rate = max(self.min_rate, self.rate * 0.75)
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=5.0, min_rate=0.5, max_rate=50.0, burst=10, latency_target=2.0):
+        self.settings = {"rate": rate, "min_rate": min_rate, "max_rate": max_rate, "burst": burst, "latency_target": latency_target}
+        self.hosts = {}
+
+    # Limiteur associé à l'hôte de l'URL
+    def for_url(self, url):
+        host = urlsplit(url).netloc.lower()
+        if host not in self.hosts:
+            self.hosts[host] = HostRateLimiter(**self.settings)
+        return self.hosts[host]
+
+    # Afficher le débit atteint pour chaque hôte
+    def report(self):
+        for host, limiter in self.hosts.items():
+            print(f"[INFO] Débit final pour {host} : {limiter.rate:.1f} requête(s)/s.")
+
+# Requête GET avec nouvelles tentatives, partagée par le scraping HTML et l'API de commentaires.
+# Les erreurs temporaires (réseau, 429, 5xx) sont retentées avec un backoff exponentiel et
+# `Retry-After` est respecté ; les autres erreurs 4xx abandonnent immédiatement (None).
+# `handle(response)` lit une réponse valide (ou 304) et renvoie le résultat, ou RETRY pour relancer
+# la requête sans compter de tentative. `headers` peut être une fonction appelée à chaque tentative.
+async def get_with_retry(session, url, handle, limiter=None, max_retries=5, delay=1, max_delay=60, slot=None, headers=None, params=None):
+    target = f"{url} {params}" if params else url
+    attempt = 0
+    while attempt < max_retries:
+        if limiter is not None:
+            await limiter.acquire()
+        wait = None
+        started_at = time.monotonic()
+        try:
+            request_headers = headers() if callable(headers) else headers
+            async with slot or contextlib.nullcontext(), session.get(url, headers=request_headers, params=params) as response:
+                if response.status in RETRYABLE_STATUS:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if limiter is not None:
+                        if response.status in THROTTLE_STATUS:
+                            limiter.on_throttle(retry_after)
+                        else:
+                            limiter.on_error()
+                    wait = retry_after if retry_after is not None else backoff_delay(attempt, delay, max_delay)
+                    print(f"[ERREUR] {target} : statut {response.status}. Tentative {attempt + 1}/{max_retries}, nouvel essai dans {wait:.1f}s.")
+                elif response.status >= 400:
+                    print(f"[ERREUR] {target} : statut {response.status}, abandon sans nouvelle tentative.")
+                    return None
+                else:
+                    result = await handle(response)
+                    if limiter is not None:
+                        limiter.on_success(time.monotonic() - started_at)
+                    if result is RETRY:
+                        continue
+                    return result
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            if limiter is not None:
+                limiter.on_error()
+            wait = backoff_delay(attempt, delay, max_delay)
+            print(f"[ERREUR] Échec de la requête {target} ({e.__class__.__name__}). Tentative {attempt + 1}/{max_retries}.")
+        attempt += 1
+        # L'attente se fait hors de `slot` pour ne pas bloquer les autres requêtes
+        await asyncio.sleep(wait)
+    return None
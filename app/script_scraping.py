@@ -1,13 +1,21 @@
 import asyncio
-import requests
-from bs4 import BeautifulSoup
-import time
+import aiohttp
+import contextlib
 import re
-import json
-from pymongo import MongoClient
+import math
+import os
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import BulkWriteError
 from hdfs import InsecureClient
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from http_cache import HttpCache, hash_body
+from hdfs_export import WEBTOON_SCHEMAS, export_segment, flatten_webtoon, load_high_water_mark, save_high_water_mark
+from date_fields import to_datetime
+from mongo_stream import stream_documents
+from rate_limiter import RETRY, AdaptiveRateLimiter, get_with_retry
+from html_parsing import PARSER_VERSION, parse_episode_page, parse_genre_links, parse_webtoon_cards, parse_webtoon_details
 
 # Configuration MongoDB et HDFS
 # MONGO_URI = "mongodb://localhost:27017"
@@ -17,8 +25,62 @@ MONGO_COLLECTION = "webtoon_data"
 MONGO_PROCESSED_URLS_COLLECTION = False #"processed_urls"
 HDFS_URL = "http://namenode:9870"
 HDFS_DIR = "/webtoons_data"
+HDFS_DATASET = "webtoon_data"  # Sous-dossier des segments exportés
+HDFS_EXPORT_FORMAT = "both"  # "json", "parquet" (tables webtoons/episodes) ou "both"
 USE_HDFS = True
 
+# Configuration du client HTTP asynchrone (connexions keep-alive partagées)
+HTTP_CONNECTION_LIMIT = 100  # Nombre total de connexions simultanées
+HTTP_CONNECTION_LIMIT_PER_HOST = 20  # Nombre de connexions simultanées par hôte
+HTTP_KEEPALIVE_TIMEOUT = 30  # Durée de vie d'une connexion inactive (secondes)
+HTTP_TIMEOUT = 30  # Délai maximal d'une requête (secondes)
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept-Encoding": "gzip, deflate",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
+
+# Nombre maximal de pages d'épisodes téléchargées en parallèle pour un même webtoon
+PAGINATION_FAN_OUT = 10
+
+# Mise à jour incrémentale des épisodes : arrêt dès le premier épisode déjà connu
+INCREMENTAL_EPISODES = True
+LIKE_REFRESH_WINDOW = 20  # Nombre d'épisodes récents dont les likes sont rafraîchis
+
+# Limitation de débit adaptative par hôte et politique de nouvelles tentatives
+USE_RATE_LIMITER = True
+RATE_LIMIT_INITIAL = 5.0  # Requêtes par seconde et par hôte au démarrage
+RATE_LIMIT_MIN = 0.5
+RATE_LIMIT_MAX = 50.0
+RATE_LIMIT_LATENCY_TARGET = 2.0  # Au-delà (secondes), le débit est réduit
+RETRY_MAX_DELAY = 60  # Attente maximale entre deux tentatives (secondes)
+
+# Cache HTTP sur disque (revalidation ETag / Last-Modified, éviction LRU)
+USE_HTTP_CACHE = True
+HTTP_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "http_cache")
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Nombre de processus dédiés au parsing HTML (None = nombre de cœurs)
+PARSER_WORKERS = None
+
+# Pipeline d'extraction : nombre de workers par étape et taille maximale des files entre étapes
+PIPELINE_WORKERS = {"discovery": 4, "details": 10, "episodes": 10, "parse": 4}
+PIPELINE_QUEUE_SIZE = 50
+SINK_FLUSH_INTERVAL = 10  # Délai maximal (secondes) avant l'écriture d'un batch incomplet
+
+# Session HTTP, cache et pool de parsing partagés pendant toute l'exécution de `extract_and_store_webtoons_async`
+http_session = None
+http_cache = None
+parse_executor = None
+crawl_registry = None
+# Limite globale du nombre de requêtes HTTP en cours (tous webtoons confondus)
+request_semaphore = None
+rate_limiter = None
+# Écritures MongoDB lancées en arrière-plan et attendues en fin d'extraction
+pending_writes = set()
+# Compteurs cumulés des écritures terminées pendant l'exécution
+write_totals = {"matched": 0, "upserted": 0, "failed": 0}
+
 DAY_MAP = {
     "LUN": 0, "LUNDI": 0,
     "MAR": 1, "MARDI": 1,
@@ -60,7 +122,7 @@ def is_url_processed(url, last_update):
         else:
             if last_update:
                 # Convertir la date de dernière mise à jour en objet datetime pour la comparaison
-                last_update_dt = datetime.strptime(last_update, "%Y-%m-%d")
+                last_update_dt = to_datetime(last_update)
                 # Vérifier si la mise à jour a été faite aujourd'hui
                 return last_update_dt.date() == datetime.today().date()
             else:
@@ -76,35 +138,116 @@ def clear_processed_urls():
         processed_urls_collection.delete_many({})
         print("[INFO] Toutes les URLs traitées ont été supprimées de MongoDB.")
 
-# Requête avec tentatives en cas d'erreur
-async def fetch_with_retry_async(url, max_retries=5, delay=5):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = await asyncio.to_thread(requests.get, url)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            print(f"[ERREUR] Échec de connexion à {url}. Tentative {attempt + 1}/{max_retries}.")
-            attempt += 1
-            await asyncio.sleep(delay)
-    return None
+# Créer une session HTTP avec un pool de connexions keep-alive limité par hôte
+def create_http_session():
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONNECTION_LIMIT,
+        limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HTTP_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        auto_decompress=True,
+    )
+
+# Requête avec tentatives en cas d'erreur, retourne le contenu HTML de la page.
+# Les erreurs temporaires (réseau, 429, 5xx) sont retentées avec un backoff exponentiel
+# et `Retry-After` est respecté ; les autres erreurs 4xx abandonnent immédiatement.
+async def fetch_with_retry_async(url, max_retries=5, delay=1):
+    # Sans session partagée (appel isolé), ouvrir une session temporaire
+    if http_session is None:
+        async with create_http_session() as session:
+            return await _fetch_with_retry(session, url, max_retries, delay)
+    return await _fetch_with_retry(http_session, url, max_retries, delay)
+
+# Réserver une place parmi les requêtes en cours (sans limite hors extraction)
+def request_slot():
+    return request_semaphore if request_semaphore is not None else contextlib.nullcontext()
+
+async def _fetch_with_retry(session, url, max_retries, delay):
+    revalidate = http_cache is not None
+    limiter = rate_limiter.for_url(url) if rate_limiter is not None else None
+
+    # Requête conditionnelle si la page est déjà en cache
+    def headers():
+        return http_cache.validators(url) if revalidate else {}
+
+    async def handle(response):
+        nonlocal revalidate
+        if response.status == 304 and http_cache is not None:
+            body = http_cache.load(url)
+            if body is not None:
+                return body
+            # Corps absent du cache : redemander la page complète
+            revalidate = False
+            return RETRY
+        body = await response.text()
+        if http_cache is not None:
+            http_cache.store(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return body
+
+    return await get_with_retry(session, url, handle, limiter, max_retries, delay, RETRY_MAX_DELAY, request_slot(), headers)
 
 # Fonction pour insérer ou mettre à jour en batch dans MongoDB, avec ajout de `last_update`
 def batch_upsert(data):
+    counts = {"matched": 0, "upserted": 0, "failed": 0}
+    if not data:
+        return counts
+
+    last_update = datetime.now()
+    bulk_operations = []
+    for doc in data:
+        doc["last_update"] = last_update
+        bulk_operations.append(UpdateOne({"url": doc["url"]}, {"$set": doc}, upsert=True))
+
     try:
-        for doc in data:
-            doc["last_update"] = datetime.today().strftime("%Y-%m-%d")
-            collection.update_one(
-                {"title": doc["title"]},
-                {"$set": doc},
-                upsert=True
-            )
-        print(f"[INFO] Mise à jour de batch effectuée pour {len(data)} documents.")
+        result = collection.bulk_write(bulk_operations, ordered=False)
+        counts["matched"] = result.matched_count
+        counts["upserted"] = result.upserted_count
     except BulkWriteError as e:
-        print(f"[ERREUR] Erreur lors de la mise à jour en batch : {e.details}")
-        for error in e.details['writeErrors']:
+        counts["matched"] = e.details.get("nMatched", 0)
+        counts["upserted"] = e.details.get("nUpserted", 0)
+        counts["failed"] = len(e.details.get("writeErrors", []))
+        print(f"[ERREUR] Erreur lors de la mise à jour en batch : {counts['failed']} échec(s).")
+        for error in e.details.get("writeErrors", []):
             print("Erreur de mise à jour:", error)
+    print(f"[INFO] Mise à jour de batch effectuée pour {len(data)} documents "
+          f"({counts['matched']} existant(s), {counts['upserted']} inséré(s), {counts['failed']} échec(s)).")
+    return counts
+
+# Version asynchrone de `batch_upsert`, exécutée dans un thread
+async def batch_upsert_async(data):
+    try:
+        return await asyncio.to_thread(batch_upsert, data)
+    except Exception as e:
+        print(f"[ERREUR] Erreur lors de l'écriture du batch dans MongoDB : {e}")
+        return {"matched": 0, "upserted": 0, "failed": len(data)}
+
+# Ajouter les compteurs d'une écriture terminée aux totaux de l'exécution
+def _record_write(task):
+    pending_writes.discard(task)
+    if not task.cancelled():
+        for key, count in task.result().items():
+            write_totals[key] += count
+
+# Lancer l'écriture d'un batch en arrière-plan pour ne pas bloquer le scraping
+def schedule_batch_upsert(data):
+    task = asyncio.create_task(batch_upsert_async(list(data)))
+    pending_writes.add(task)
+    task.add_done_callback(_record_write)
+    return task
+
+# Attendre la fin de toutes les écritures en arrière-plan et renvoyer les compteurs cumulés de l'exécution
+async def wait_pending_writes():
+    while pending_writes:
+        await asyncio.gather(*list(pending_writes))
+    totals = dict(write_totals)
+    for key in write_totals:
+        write_totals[key] = 0
+    return totals
 
 # Fonction pour vérifier la condition de mise à jour des webtoons en fonction de `day_info`
 def should_update_webtoon(day_info, day_filter, last_update):
@@ -118,7 +261,7 @@ def should_update_webtoon(day_info, day_filter, last_update):
 
     # Si `day_info` est "TERMINÉ" ou `day_filter` contient "TERMINÉ", vérifier la date de dernière mise à jour
     if day_info == "TERMINÉ" or (day_filter and day_filter.upper() == "TERMINÉ"):
-        last_update_dt = datetime.strptime(last_update, "%Y-%m-%d")
+        last_update_dt = to_datetime(last_update)
         days_since_last_update = (today - last_update_dt).days
         print(f"[DEBUG] Webtoon terminé. Dernière mise à jour : {last_update}. Jours écoulés : {days_since_last_update}")
         return days_since_last_update > 30
@@ -142,66 +285,98 @@ def should_update_webtoon(day_info, day_filter, last_update):
 
     return today_is_update_day
 
-# Récupérer tous les liens de pagination et les trier par numéro de page
-async def get_all_pagination_links_async(base_url):
-    pagination_links = set()
-    queue = [f"{base_url}&page=1"]
-
-    while queue:
-        current_url = queue.pop(0)
-        
-        if current_url in pagination_links:
-            continue
-        
-        response = await fetch_with_retry_async(current_url)
-        if response is None:
-            continue
-        
-        pagination_links.add(current_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        page_links = soup.select("div.paginate a")
-        for link in page_links:
-            page_url = link.get("href")
-            if page_url and "page" in page_url:
-                full_url = f"https://www.webtoons.com{page_url}"
-                if full_url not in pagination_links:
-                    queue.append(full_url)
-
-    pagination_links = sorted(pagination_links, key=lambda url: int(re.search(r"page=(\d+)", url).group(1)))
-    return pagination_links
+# Exécuter une fonction de parsing dans le pool de processus pour ne pas bloquer la boucle asyncio
+async def run_parser_async(parser, html):
+    if parse_executor is None:
+        return parser(html)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_executor, parser, html)
+
+# Parser le HTML d'une page en réutilisant le résultat mis en cache si le corps n'a pas changé.
+# La lecture et l'écriture du cache (fichiers JSON) tournent dans un thread, hors de la boucle asyncio.
+async def parse_cached_async(url, html, parser):
+    if http_cache is None:
+        return await run_parser_async(parser, html)
+    body_hash = hash_body(html)
+    parsed = await asyncio.to_thread(http_cache.get_parsed, url, parser.__name__, body_hash)
+    if parsed is None:
+        parsed = await run_parser_async(parser, html)
+        await asyncio.to_thread(http_cache.set_parsed, url, parser.__name__, body_hash, parsed)
+    return parsed
+
+# Télécharger puis parser une page, None si la page est inaccessible
+async def fetch_and_parse_async(url, parser):
+    html = await fetch_with_retry_async(url)
+    if html is None:
+        return None
+    return await parse_cached_async(url, html, parser)
+
+# Récupérer toutes les pages de la liste d'épisodes, triées par numéro de page.
+# La page 1 donne le nombre de pages, les suivantes sont téléchargées en parallèle
+# (au plus `PAGINATION_FAN_OUT` à la fois) et conservées, déjà parsées, pour l'extraction des épisodes.
+async def get_all_pagination_pages_async(base_url, first_page=None, page_limit=None):
+    if first_page is None:
+        first_page = await fetch_and_parse_async(f"{base_url}&page=1", parse_episode_page)
+        if first_page is None:
+            return []
+
+    pages = {1: first_page}
+    last_page = first_page["last_page"]
+    semaphore = asyncio.Semaphore(PAGINATION_FAN_OUT)
+
+    async def fetch_page(page_number):
+        async with semaphore:
+            return page_number, await fetch_and_parse_async(f"{base_url}&page={page_number}", parse_episode_page)
+
+    # Boucler tant que les pages téléchargées révèlent des pages supplémentaires
+    # (cas où l'estimation faite depuis la page 1 serait trop basse)
+    while True:
+        if page_limit is not None:
+            last_page = min(last_page, page_limit)
+        missing_pages = [number for number in range(2, last_page + 1) if number not in pages]
+        if not missing_pages:
+            break
+
+        results = await asyncio.gather(*(fetch_page(number) for number in missing_pages))
+        discovered_last_page = last_page
+        for page_number, page in results:
+            # Une page en échec est marquée pour ne pas être redemandée
+            pages[page_number] = page
+            if page is not None:
+                discovered_last_page = max(discovered_last_page, page["last_page"])
+        if discovered_last_page <= last_page:
+            break
+        last_page = discovered_last_page
+
+    return [(f"{base_url}&page={number}", pages[number]) for number in sorted(pages) if pages[number] is not None]
 
 # Récupérer les épisodes d'un webtoon
-async def get_webtoon_episodes_async(webtoon_url, episode_limit=None):
+async def get_webtoon_episodes_async(webtoon_url, episode_limit=None, first_page=None, known_episodes=None):
+    # Mode incrémental si des épisodes sont déjà stockés pour ce webtoon
+    if INCREMENTAL_EPISODES and known_episodes and episode_limit is None:
+        return await get_new_webtoon_episodes_async(webtoon_url, known_episodes, first_page=first_page)
+
     episodes = []
+    seen_urls = set()
     count = 0
-    pagination_links = await get_all_pagination_links_async(webtoon_url)
-    
-    for page_url in pagination_links:
+    page_limit = None
+    if episode_limit is not None:
+        # Une page contient au moins 10 épisodes : inutile de télécharger au-delà
+        page_limit = max(1, math.ceil(episode_limit / 10))
+    pagination_pages = await get_all_pagination_pages_async(webtoon_url, first_page=first_page, page_limit=page_limit)
+
+    for page_url, page in pagination_pages:
         if episode_limit is not None and count >= episode_limit:
             print(f"[INFO] Limite d'épisodes atteinte ({episode_limit}).")
             return episodes
-        
-        response = await fetch_with_retry_async(page_url)
-        if response is None:
-            continue
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        episode_items = soup.select("ul#_listUl li._episodeItem")
-        for episode in episode_items:
+
+        for episode_info in page["episodes"]:
             if episode_limit is not None and count >= episode_limit:
                 return episodes
-            
-            like_count_element = episode.select_one("span.like_area")
-            like_count_text = like_count_element.text.strip() if like_count_element else "0"
-            like_count = int(re.sub(r'[^\d]', '', like_count_text))
-            
-            episode_info = {
-                'episode_title': episode.select_one("span.subj span").text.strip(),
-                'date': episode.select_one("span.date").text.strip(),
-                'like_count': like_count,
-                'url': episode.find("a")["href"]
-            }
+            # Une page hors limites peut renvoyer des épisodes déjà vus
+            if episode_info['url'] in seen_urls:
+                continue
+            seen_urls.add(episode_info['url'])
             episodes.append(episode_info)
             count += 1
         
@@ -209,237 +384,321 @@ async def get_webtoon_episodes_async(webtoon_url, episode_limit=None):
     
     return episodes
 
-# Fonction pour convertir les vues de format string en entier
-def convert_views(view_str):
-    view_str = view_str.replace('\xa0', ' ').replace(' ', '').strip()
-    if 'M' in view_str:
-        return int(float(view_str.replace('M', '').replace(',', '.')) * 1e6)
-    elif 'K' in view_str:
-        return int(float(view_str.replace('K', '').replace(',', '.')) * 1e3)
-    else:
-        return int(view_str.replace(',', ''))
-
-# Fonction pour convertir les abonnés en entier
-def convert_subscribers(subscriber_str):
-    subscriber_str = subscriber_str.replace('\xa0', ' ').replace(' ', '').strip()
-    return int(subscriber_str)
-
-# Fonction pour convertir la note en float
-def convert_rating(rating_str):
-    return float(rating_str.replace(',', '.').strip())
-
-# Fonction pour récupérer les détails d'un webtoon de manière asynchrone avec conversion des données numériques
-async def get_webtoon_details_async(webtoon_url):
-    response = await fetch_with_retry_async(webtoon_url)
-    if response is None:
-        return {}
-    soup = BeautifulSoup(response.text, 'html.parser')
-    webtoon_info = {}
-
-    try:
-        webtoon_info['title'] = soup.select_one("h1.subj").text.strip() if soup.select_one("h1.subj") else ""
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le titre: {e}")
-    
-    try:
-        webtoon_info['cover_image'] = soup.select_one("span.thmb img")['src'] if soup.select_one("span.thmb img") else ""
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer l'image de couverture: {e}")
-    
-    try:
-        webtoon_info['genre'] = soup.select_one("h2.genre").text.strip() if soup.select_one("h2.genre") else ""
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le genre: {e}")
-
-    try:
-        authors_info = []
-        author_sections = soup.select("div.ly_creator_in")
-        
-        for section in author_sections:
-            name = section.select_one("h3.title").text.strip() if section.select_one("h3.title") else ""
-            desc = section.select_one("p.desc").text.strip() if section.select_one("p.desc") else ""
-            authors_info.append({"name": name, "description": desc})
-        
-        webtoon_info['authors'] = authors_info
-
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer les informations des auteurs: {e}")
-
-    try:
-        # Extraire les vues et les convertir en entier
-        views_str = soup.select_one("ul.grade_area li span.ico_view + em").text.strip() if soup.select_one("ul.grade_area li span.ico_view + em") else ""
-        webtoon_info['views'] = convert_views(views_str) if views_str else 0
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le nombre de vues: {e}")
-
-    try:
-        # Extraire les abonnés et les convertir en entier
-        subscribers_str = soup.select_one("ul.grade_area li span.ico_subscribe + em").text.strip() if soup.select_one("ul.grade_area li span.ico_subscribe + em") else ""
-        webtoon_info['subscribers'] = convert_subscribers(subscribers_str) if subscribers_str else 0
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le nombre d'abonnés: {e}")
-
-    try:
-        # Extraire la note et la convertir en float
-        rating_str = soup.select_one("ul.grade_area li span.ico_grade5 + em").text.strip() if soup.select_one("ul.grade_area li span.ico_grade5 + em") else ""
-        webtoon_info['rating'] = convert_rating(rating_str) if rating_str else 0.0
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer la note: {e}")
-
-    try:
-        webtoon_info['summary'] = soup.select_one("p.summary").text.strip() if soup.select_one("p.summary") else ""
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le résumé: {e}")
-
-    try:
-        webtoon_info['day_info'] = soup.select_one("p.day_info").text.strip() if soup.select_one("p.day_info") else ""
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le jour de publication: {e}")
-
-    # Récupérer le QR code
-    try:
-        qr_code_element = soup.select_one("div.detail_install_app img.img_qrcode")
-        qr_code_src = qr_code_element['src'] if qr_code_element else ""
-        webtoon_info['qr_code'] = f"https://www.webtoons.com{qr_code_src}" if qr_code_src.startswith("/") else qr_code_src
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer le QR code: {e}")
-    
-    # Récupérer les épisodes de manière asynchrone
-    try:
-        webtoon_info['episodes'] = await get_webtoon_episodes_async(webtoon_url)
-    except Exception as e:
-        print(f"[Erreur] Impossible de récupérer les épisodes: {e}")
-        webtoon_info['episodes'] = []
-
-    return webtoon_info
-
+# Récupérer uniquement les nouveaux épisodes d'un webtoon déjà stocké.
+# Les pages sont parcourues depuis la page 1 (épisodes les plus récents) et le parcours
+# s'arrête dès qu'un épisode connu est atteint et que les `like_refresh_window` épisodes
+# les plus récents ont été relus (pour rafraîchir leurs likes).
+async def get_new_webtoon_episodes_async(webtoon_url, known_episodes, first_page=None, like_refresh_window=LIKE_REFRESH_WINDOW):
+    known_urls = {episode.get("url") for episode in known_episodes}
+    recent_episodes = []
+    seen_urls = set()
+    reached_known = False
+    done = False
+    pages_read = 0
+    page_number = 1
+    last_page = None
+    page = first_page
+
+    while not done and (last_page is None or page_number <= last_page):
+        if page is None:
+            page = await fetch_and_parse_async(f"{webtoon_url}&page={page_number}", parse_episode_page)
+            if page is None:
+                break
+        pages_read += 1
+        if last_page is None:
+            last_page = page["last_page"]
+
+        for episode_info in page["episodes"]:
+            if episode_info['url'] in seen_urls:
+                continue
+            if episode_info['url'] in known_urls:
+                reached_known = True
+                if len(recent_episodes) >= like_refresh_window:
+                    done = True
+                    break
+            seen_urls.add(episode_info['url'])
+            recent_episodes.append(episode_info)
+
+        page_number += 1
+        page = None
+
+    new_count = sum(1 for episode in recent_episodes if episode['url'] not in known_urls)
+    if not reached_known:
+        print(f"[INFO] Aucun épisode connu retrouvé pour {webtoon_url}, liste complète relue.")
+
+    # Fusion : épisodes récents (nouveaux ou rafraîchis) puis le reste de l'historique stocké
+    episodes = recent_episodes + [episode for episode in known_episodes if episode.get("url") not in seen_urls]
+    print(f"[INFO] {new_count} nouvel(s) épisode(s) pour {webtoon_url} ({len(recent_episodes)} relus, {pages_read} page(s)).")
+    return episodes
 
-# Fonction pour traiter chaque webtoon de manière asynchrone
-async def process_webtoon(genre_url, webtoon_url, processed_webtoons, day_filter):
-    # Récupère le webtoon existant dans MongoDB pour vérifier la date de dernière mise à jour
-    webtoon_record = collection.find_one({"url": webtoon_url}) or {}
-    last_update = webtoon_record.get("last_update", None)
-    day_info = webtoon_record.get("day_info", "")
-    
-    # Vérifier si l'URL est déjà traitée
-    if is_url_processed(webtoon_url, last_update):
-        print(f"[INFO] Webtoon '{webtoon_url}' déjà traité, passage au suivant.")
-        return None
+# Normaliser l'URL d'un webtoon (schéma/hôte en minuscules, paramètres triés, sans fragment)
+# pour qu'un même titre listé dans plusieurs genres ait toujours la même clé
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+# Registre des webtoons en cours de traitement ou déjà traités pendant une extraction.
+# Toutes les tâches tournent dans la même boucle asyncio et `claim` ne contient aucun
+# `await` : la vérification et la réservation sont donc atomiques entre les tâches.
+class CrawlRegistry:
+    def __init__(self):
+        self.in_flight = set()
+        self.done = set()
+        self.skipped = 0
+
+    # Réserver une URL ; False si une autre tâche l'a déjà prise pendant cette extraction
+    def claim(self, url):
+        if url in self.in_flight or url in self.done:
+            self.skipped += 1
+            return False
+        self.in_flight.add(url)
+        return True
 
-    # Vérifier si le webtoon doit être mis à jour en fonction de `day_info`
-    if should_update_webtoon(day_info, day_filter, last_update):
-        webtoon_details = await get_webtoon_details_async(webtoon_url)
-        if webtoon_details:
-            webtoon_details["url"] = webtoon_url
-            processed_webtoons.add(webtoon_url)
-            print(f"[INFO] Détails du webtoon traités pour '{webtoon_url}'")
-            return webtoon_details
-    return None
-
-async def get_webtoons_in_genre_async(genre_url, semaphore, webtoon_limit=None, batch_size=2, day_filter=None):
-    async with semaphore:
-        processed_webtoons = set()
-        response = await fetch_with_retry_async(genre_url)
-        if response is None:
-            return processed_webtoons
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        webtoon_cards = soup.select("ul.card_lst li a")
-
-        tasks = []
-        webtoon_details_list = []
-        
-        for index, card in enumerate(webtoon_cards):
-            if webtoon_limit is not None and index >= webtoon_limit:
-                break
+    # Marquer une URL comme traitée (succès ou échec : elle ne sera pas retentée)
+    def finish(self, url):
+        self.in_flight.discard(url)
+        self.done.add(url)
+
+# Créer les index utilisés par le scraping (à appeler au démarrage)
+def ensure_indexes():
+    collection.create_index("url")
+    collection.create_index([("last_update", 1), ("_id", 1)])
+    print("[INFO] Index MongoDB vérifiés pour la collection webtoon_data.")
+
+# Charger en une seule requête les informations de mise à jour de tous les webtoons d'une page de genre
+def load_webtoon_records(webtoon_urls):
+    projection = {"_id": 0, "url": 1, "last_update": 1, "day_info": 1}
+    return {record["url"]: record for record in collection.find({"url": {"$in": webtoon_urls}}, projection)}
+
+# Charger les épisodes déjà stockés d'un webtoon (uniquement pour ceux à mettre à jour)
+def load_known_episodes(webtoon_url):
+    record = collection.find_one({"url": webtoon_url}, {"_id": 0, "episodes": 1}) or {}
+    return record.get("episodes")
+
+# Pipeline d'extraction en flux : découverte des webtoons → page de détails → épisodes
+# → parsing → écriture MongoDB. Chaque étape a ses propres workers et les files bornées
+# entre étapes freinent les étapes amont quand l'aval sature. Un webtoon lent n'immobilise
+# que son worker, et le débit réseau est limité par `request_semaphore`.
+class CrawlPipeline:
+    def __init__(self, webtoon_limit=None, batch_size=20, day_filter=None, workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+        self.webtoon_limit = webtoon_limit
+        self.batch_size = batch_size
+        self.day_filter = day_filter
+        self.workers = workers
+        self.genre_queue = asyncio.Queue()
+        self.detail_queue = asyncio.Queue(maxsize=queue_size)
+        self.episode_queue = asyncio.Queue(maxsize=queue_size)
+        self.parse_queue = asyncio.Queue(maxsize=queue_size)
+        self.sink_queue = asyncio.Queue(maxsize=queue_size)
+        self.buffer = []
+        self.tasks = []
+        self.stats = {"genres": 0, "queued": 0, "parsed": 0, "failed": 0}
+
+    async def run(self, genre_urls):
+        for genre_url in genre_urls:
+            self.genre_queue.put_nowait(genre_url)
+
+        self._start_stage(self.workers["discovery"], self.genre_queue, self.discover_webtoons)
+        self._start_stage(self.workers["details"], self.detail_queue, self.fetch_details)
+        self._start_stage(self.workers["episodes"], self.episode_queue, self.fetch_episodes)
+        self._start_stage(self.workers["parse"], self.parse_queue, self.parse_webtoon)
+        self.tasks.append(asyncio.create_task(self._sink_worker()))
 
-            webtoon_url = card["href"]
-            # Créer une tâche de traitement de webtoon et l'ajouter à la liste des tâches
-            tasks.append(process_webtoon(genre_url, webtoon_url, processed_webtoons, day_filter))
-
-            # Lorsque `tasks` atteint la taille de `batch_size`, traiter le lot
-            if len(tasks) >= batch_size:
-                # Exécuter les tâches en parallèle et ajouter les résultats à la liste des détails
-                webtoon_details_list += await asyncio.gather(*tasks)
-                # Filtrer les `None`
-                webtoon_details_list = [details for details in webtoon_details_list if details]
-                # Insérer le lot de détails dans MongoDB avec `batch_upsert`
-                batch_upsert(webtoon_details_list)
-                # Réinitialiser `tasks` et `webtoon_details_list`
-                tasks.clear()
-                webtoon_details_list.clear()
-
-        # Traiter les tâches restantes
-        if tasks:
-            webtoon_details_list += await asyncio.gather(*tasks)
-            webtoon_details_list = [details for details in webtoon_details_list if details]
-            batch_upsert(webtoon_details_list)
-            
-        return processed_webtoons
-
-
-
-# Fonction asynchrone pour transférer les données mises à jour vers HDFS
+        try:
+            # Chaque étape transmet ses éléments avant de les acquitter : attendre les files dans l'ordre suffit
+            for queue in (self.genre_queue, self.detail_queue, self.episode_queue, self.parse_queue, self.sink_queue):
+                await queue.join()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self._flush()
+        print(f"[INFO] Pipeline terminé : {self.stats['genres']} genre(s), {self.stats['queued']} webtoon(s) à mettre à jour, "
+              f"{self.stats['parsed']} traité(s), {self.stats['failed']} échec(s).")
+
+    def _start_stage(self, count, queue, handler):
+        for _ in range(count):
+            self.tasks.append(asyncio.create_task(self._worker(queue, handler)))
+
+    async def _worker(self, queue, handler):
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+            except Exception as e:
+                print(f"[ERREUR] Étape '{handler.__name__}' en échec : {e}")
+                if isinstance(item, dict):
+                    self._drop(item)
+            finally:
+                queue.task_done()
+
+    # Abandonner un webtoon en cours (il ne sera pas retenté pendant cette extraction)
+    def _drop(self, job):
+        self.stats["failed"] += 1
+        if crawl_registry is not None:
+            crawl_registry.finish(job["url"])
+
+    # Étape 1 : lire une page de genre et mettre en file les webtoons à mettre à jour
+    async def discover_webtoons(self, genre_url):
+        webtoon_urls = await fetch_and_parse_async(genre_url, parse_webtoon_cards)
+        if webtoon_urls is None:
+            return
+        self.stats["genres"] += 1
+        webtoon_urls = list(dict.fromkeys(canonical_url(webtoon_url) for webtoon_url in webtoon_urls))
+        if self.webtoon_limit is not None:
+            webtoon_urls = webtoon_urls[:self.webtoon_limit]
+
+        # Une seule requête projetée pour tous les webtoons de la page
+        webtoon_records = await asyncio.to_thread(load_webtoon_records, webtoon_urls)
+
+        for webtoon_url in webtoon_urls:
+            webtoon_record = webtoon_records.get(webtoon_url, {})
+            last_update = webtoon_record.get("last_update", None)
+            day_info = webtoon_record.get("day_info", "")
+
+            # Vérifier si l'URL est déjà traitée
+            if is_url_processed(webtoon_url, last_update):
+                print(f"[INFO] Webtoon '{webtoon_url}' déjà traité, passage au suivant.")
+                continue
+            # Vérifier si le webtoon doit être mis à jour en fonction de `day_info`
+            if not should_update_webtoon(day_info, self.day_filter, last_update):
+                continue
+            # Un webtoon présent dans plusieurs genres n'est récupéré qu'une fois par extraction
+            if crawl_registry is not None and not crawl_registry.claim(webtoon_url):
+                print(f"[INFO] Webtoon '{webtoon_url}' déjà pris en charge via un autre genre, passage au suivant.")
+                continue
+
+            self.stats["queued"] += 1
+            await self.detail_queue.put({"url": webtoon_url, "record": webtoon_record})
+
+    # Étape 2 : télécharger la page de détails (qui est aussi la page 1 de la liste d'épisodes)
+    async def fetch_details(self, job):
+        html = await fetch_with_retry_async(job["url"])
+        if html is None:
+            self._drop(job)
+            return
+        job["html"] = html
+        await self.episode_queue.put(job)
+
+    # Étape 3 : récupérer les épisodes (en mode incrémental si le webtoon est déjà stocké)
+    async def fetch_episodes(self, job):
+        webtoon_url = job["url"]
+        try:
+            known_episodes = await asyncio.to_thread(load_known_episodes, webtoon_url) if job["record"] else None
+            first_page = await parse_cached_async(webtoon_url, job["html"], parse_episode_page)
+            job["episodes"] = await get_webtoon_episodes_async(webtoon_url, first_page=first_page, known_episodes=known_episodes)
+        except Exception as e:
+            print(f"[Erreur] Impossible de récupérer les épisodes: {e}")
+            job["episodes"] = []
+        await self.parse_queue.put(job)
+
+    # Étape 4 : extraire les détails et assembler le document final
+    async def parse_webtoon(self, job):
+        webtoon_url = job["url"]
+        webtoon_details = dict(await parse_cached_async(webtoon_url, job.pop("html"), parse_webtoon_details))
+        webtoon_details["episodes"] = job["episodes"]
+        webtoon_details["url"] = webtoon_url
+        if crawl_registry is not None:
+            crawl_registry.finish(webtoon_url)
+        self.stats["parsed"] += 1
+        print(f"[INFO] Détails du webtoon traités pour '{webtoon_url}'")
+        await self.sink_queue.put(webtoon_details)
+
+    # Étape 5 : regrouper les documents et les écrire par batch (taille atteinte ou délai écoulé)
+    async def _sink_worker(self):
+        while True:
+            try:
+                webtoon_details = await asyncio.wait_for(self.sink_queue.get(), timeout=SINK_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                self._flush()
+                continue
+            self.buffer.append(webtoon_details)
+            self.sink_queue.task_done()
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            schedule_batch_upsert(self.buffer)
+            self.buffer = []
+
+# Fonction asynchrone pour transférer vers HDFS les webtoons modifiés depuis le dernier export.
+# Chaque export écrit un nouveau segment daté dans `HDFS_DIR/webtoon_data/` : la durée dépend du
+# volume modifié, pas de l'historique. La sélection est un parcours de l'index sur `last_update`.
 async def transfer_updated_data_to_hdfs(batch_size):
     if not USE_HDFS:
         print("[INFO] Le transfert vers HDFS est désactivé.")
         return
 
-    hdfs_file_path = f"{HDFS_DIR}/webtoon_data.json"
-    temp_hdfs_file_path = f"{HDFS_DIR}/webtoon_data_temp.json"
-
     try:
-        latest_updates = {}
-        total_docs = collection.count_documents({})
-        for start in range(0, total_docs, batch_size):
-            docs_batch = list(collection.find().skip(start).limit(batch_size))
-            for doc in docs_batch:
-                doc["_id"] = str(doc["_id"])
-                url = doc["url"]
-                last_update = doc.get("last_update")
-                if url not in latest_updates or last_update > latest_updates[url]["last_update"]:
-                    latest_updates[url] = doc
-
-        with hdfs_client.write(temp_hdfs_file_path, encoding='utf-8', overwrite=True) as writer:
-            if hdfs_client.status(hdfs_file_path, strict=False):
-                with hdfs_client.read(hdfs_file_path, encoding='utf-8') as reader:
-                    for line in reader:
-                        existing_doc = json.loads(line.strip())
-                        url = existing_doc["url"]
-                        if url in latest_updates:
-                            writer.write(json.dumps(latest_updates[url]) + "\n")
-                            latest_updates.pop(url)
-                        else:
-                            writer.write(json.dumps(existing_doc) + "\n")
-
-            for new_doc in latest_updates.values():
-                writer.write(json.dumps(new_doc) + "\n")
-
-        hdfs_client.delete(hdfs_file_path)
-        hdfs_client.rename(temp_hdfs_file_path, hdfs_file_path)
-        print(f"[INFO] Transfert vers HDFS terminé. Données mises à jour dans {hdfs_file_path}.")
+        high_water_mark = to_datetime(load_high_water_mark(db, HDFS_DATASET))
+        query = {"last_update": {"$gt": high_water_mark}} if high_water_mark else {}
+        if collection.count_documents(query, limit=1) == 0:
+            print("[INFO] Aucun webtoon modifié depuis le dernier export HDFS.")
+            return
+
+        new_high_water_mark = high_water_mark
+        def changed_docs():
+            nonlocal new_high_water_mark
+            for doc in stream_documents(collection, query, batch_size=batch_size, sort_field="last_update"):
+                last_update = to_datetime(doc.get("last_update"))
+                if last_update and (new_high_water_mark is None or last_update > new_high_water_mark):
+                    new_high_water_mark = last_update
+                yield doc
+
+        count, paths = export_segment(hdfs_client, HDFS_DIR, HDFS_DATASET, changed_docs(), HDFS_EXPORT_FORMAT, flatten_webtoon, WEBTOON_SCHEMAS, key_field="url")
+        # Le point de reprise n'avance qu'une fois le segment entièrement écrit
+        save_high_water_mark(db, HDFS_DATASET, new_high_water_mark)
+        print(f"[INFO] Transfert vers HDFS terminé. {count} webtoon(s) exporté(s) dans {', '.join(paths)}.")
     except Exception as e:
         print(f"[ERREUR] Erreur lors du transfert des données vers HDFS : {e}")
 
-# Fonction principale asynchrone avec limite d'instances
-async def extract_and_store_webtoons_async(genres_url, webtoon_limit=None, batch_size=20, day_filter=None, instance_limit=5):
-    semaphore = asyncio.Semaphore(instance_limit)
-    response = await fetch_with_retry_async(genres_url)
-    if response is None:
-        print("[ERREUR] Impossible de récupérer la liste des genres.")
-        return
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-    genres = soup.select("ul.snb._genre li a")
-    tasks = []
-    for genre in genres:
-        genre_url = genre["href"]
-        genre_name = genre.text.strip().lower()
-        print(f"[INFO] Extraction des webtoons dans le genre : {genre_name.capitalize()}")
-        
-        tasks.append(get_webtoons_in_genre_async(genre_url, semaphore, webtoon_limit=webtoon_limit, batch_size=batch_size, day_filter=day_filter))
+# Fonction principale asynchrone, `instance_limit` borne le nombre de requêtes HTTP simultanées
+async def extract_and_store_webtoons_async(genres_url, webtoon_limit=None, batch_size=20, day_filter=None, instance_limit=5, parser_workers=PARSER_WORKERS):
+    global http_session, http_cache, parse_executor, crawl_registry, request_semaphore, rate_limiter
+    crawl_registry = CrawlRegistry()
+    request_semaphore = asyncio.Semaphore(instance_limit)
+    if USE_RATE_LIMITER:
+        rate_limiter = AdaptiveRateLimiter(RATE_LIMIT_INITIAL, RATE_LIMIT_MIN, RATE_LIMIT_MAX, latency_target=RATE_LIMIT_LATENCY_TARGET)
+    if USE_HTTP_CACHE:
+        http_cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES, PARSER_VERSION)
+    # Un seul pool de processus de parsing, réutilisé pour toute l'extraction
+    parse_executor = ProcessPoolExecutor(max_workers=parser_workers)
+
+    await asyncio.to_thread(ensure_indexes)
+
+    # Une seule session (et donc un seul pool de connexions) pour toute l'extraction
+    async with create_http_session() as session:
+        http_session = session
+        try:
+            genres = await fetch_and_parse_async(genres_url, parse_genre_links)
+            if genres is None:
+                print("[ERREUR] Impossible de récupérer la liste des genres.")
+                return
+
+            for genre_url, genre_name in genres:
+                print(f"[INFO] Extraction des webtoons dans le genre : {genre_name.capitalize()}")
+
+            pipeline = CrawlPipeline(webtoon_limit=webtoon_limit, batch_size=batch_size, day_filter=day_filter)
+            await pipeline.run([genre_url for genre_url, _ in genres])
+        finally:
+            totals = await wait_pending_writes()
+            print(f"[INFO] Écritures MongoDB : {totals['matched']} existant(s), {totals['upserted']} inséré(s), {totals['failed']} échec(s).")
+            print(f"[INFO] {len(crawl_registry.done)} webtoon(s) traité(s), {crawl_registry.skipped} doublon(s) entre genres évité(s).")
+            crawl_registry = None
+            request_semaphore = None
+            if rate_limiter is not None:
+                rate_limiter.report()
+                rate_limiter = None
+            http_session = None
+            parse_executor.shutdown()
+            parse_executor = None
+            if http_cache is not None:
+                http_cache.save()
+                http_cache.report()
+                http_cache = None
 
-    await asyncio.gather(*tasks)
     if USE_HDFS:
         await transfer_updated_data_to_hdfs(batch_size)
 
@@ -449,6 +708,6 @@ if __name__ == "__main__":
         genres_url="https://www.webtoons.com/fr/genres",
         # webtoon_limit=5,
         batch_size=20,
-        instance_limit=20,  # Nombre maximum de tâches simultanées
+        instance_limit=20,  # Nombre maximum de requêtes HTTP simultanées
         # day_filter="LUNDI"
     ))
\ No newline at end of file
@@ -1,10 +1,18 @@
+import asyncio
 import json
 import time
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient, UpdateOne
-from pymongo.errors import BulkWriteError
+from pymongo.errors import BulkWriteError, PyMongoError
 from hdfs import InsecureClient
+from comment_api import CommentApiClient, create_comment_session
+from date_fields import day_range, format_display_date, parse_display_date, to_datetime
+from driver_pool import DriverPool
+from hdfs_export import COMMENT_SCHEMAS, export_chunked_segment, flatten_comments, load_high_water_mark, save_high_water_mark
+from http_cache import hash_body
+from mongo_stream import stream_batches, stream_documents
+from number_parsing import parse_count
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
@@ -19,7 +27,29 @@ MONGO_WEBTOON_DATA_COLLECTION = "webtoon_data"
 MONGO_COMMENTS_COLLECTION = "webtoon_comments"
 HDFS_URL = "http://namenode:9870"
 HDFS_DIR = "/webtoons_data"
+HDFS_DATASET = "webtoon_comments"
+HDFS_EXPORT_FORMAT = "both"  # "json" (segments .json.gz), "parquet" (tables comments/replies) ou "both"
 USE_HDFS = True #False
+USE_COMMENT_API = True  # API JSON du widget de commentaires (sans navigateur), Selenium en repli
+SELENIUM_POOL_SIZE = 4  # Sessions Chrome simultanées (ne pas dépasser SE_NODE_MAX_SESSIONS)
+SELENIUM_MAX_PAGES_PER_SESSION = 50  # Recycler une session après N pages pour limiter les fuites mémoire
+SELENIUM_ACQUIRE_TIMEOUT = 300  # Attente maximale d'une session libre (secondes)
+SELENIUM_PAGE_LOAD_TIMEOUT = 60  # Chargement maximal d'une page d'épisode (secondes)
+COMMENT_WORKERS = {"api": 20, "selenium": SELENIUM_POOL_SIZE}  # Épisodes traités simultanément par voie
+COMMENT_QUEUE_SIZE = 100  # Épisodes en attente au maximum dans chaque file
+COMMENT_TASK_TIMEOUT = 180  # Durée maximale de récupération d'un épisode (secondes)
+COMMENT_WRITE_BATCH_SIZE = 100  # Mises à jour regroupées par bulk_write
+SINK_FLUSH_INTERVAL = 10  # Écriture des mises à jour en attente au plus tard après N secondes
+# Fréquence de revisite selon l'âge de l'épisode (depuis sa date de publication, ou depuis sa
+# première collecte si elle est illisible) : (âge maximal, intervalle), les épisodes plus anciens
+# sont revisités tous les COMMENT_REVISIT_MAX
+COMMENT_REVISIT_POLICY = [
+    (timedelta(days=7), timedelta(days=1)),
+    (timedelta(days=30), timedelta(days=3)),
+    (timedelta(days=180), timedelta(days=14)),
+]
+COMMENT_REVISIT_MAX = timedelta(days=60)
+COMMENT_REVISIT_SLACK = timedelta(hours=1)  # Marge pour que l'exécution quotidienne suivante reste éligible
 
 try:
     client = MongoClient(MONGO_URI)
@@ -63,6 +93,7 @@ def init_driver():
                 command_executor='http://selenium-chrome:4444/wd/hub',
                 options=options
             )
+            driver.set_page_load_timeout(SELENIUM_PAGE_LOAD_TIMEOUT)
             return driver
         except Exception as e:
             print(f"[ERREUR] Échec de la connexion à Selenium (tentative {attempt + 1}) : {e}")
@@ -90,168 +121,369 @@ def accept_cookies(driver):
     except Exception as e:
         print("[INFO] Aucun bouton de consentement trouvé ou erreur lors du clic :", e)
 
-# Récupérer les URLs des épisodes mis à jour aujourd'hui par lot
+# Créer les index utilisés par les sélections du jour et les mises à jour (à appeler au démarrage)
+def ensure_indexes():
+    webtoon_data_collection.create_index([("last_update", 1), ("_id", 1)])
+    comments_collection.create_index([("episode_url", 1), ("next_fetch_at", 1)])
+    comments_collection.create_index([("last_update", 1), ("_id", 1)])
+    print("[INFO] Index MongoDB vérifiés pour les collections webtoon_data et webtoon_comments.")
+
+# Intervalle avant la prochaine collecte des commentaires d'un épisode selon son âge
+def revisit_interval(age):
+    for max_age, interval in COMMENT_REVISIT_POLICY:
+        if age < max_age:
+            return interval
+    return COMMENT_REVISIT_MAX
+
+# Empreinte du contenu des commentaires, pour ne réécrire que les épisodes modifiés
+def hash_comments(comments):
+    return hash_body(json.dumps(comments, sort_keys=True, ensure_ascii=False, default=str))
+
+# Récupérer les URLs des épisodes mis à jour aujourd'hui par lot, avec leur date de publication :
+# [(episode_url, published_at)], published_at à None si la date affichée n'est pas reconnue
 def get_episode_urls(batch_size):
-    today = datetime.now().strftime("%Y-%m-%d")
     try:
-        total_episodes = webtoon_data_collection.count_documents({"last_update": {"$regex": today}})
-        print(f"Total des épisodes mis à jour aujourd'hui dans webtoon_data : {total_episodes}")
-        
-        for start in range(0, total_episodes, batch_size):
-            docs_batch = list(webtoon_data_collection.find({"last_update": {"$regex": today}})
-                        .skip(start)
-                        .limit(batch_size))
-            
+        query = {"last_update": day_range()}
+        projection = {"episodes.url": 1, "episodes.date": 1}
+        for batch_number, docs_batch in enumerate(stream_batches(webtoon_data_collection, query, projection, batch_size, sort_field="last_update"), start=1):
             urls = []
             for doc in docs_batch:
                 for episode in doc.get("episodes", []):
                     episode_url = episode.get("url")
                     if episode_url:
-                        urls.append(episode_url)
+                        urls.append((episode_url, parse_display_date(episode.get("date"))))
             
-            print(f"[INFO] {len(urls)} URLs d'épisodes récupérées depuis webtoon_data (batch {start // batch_size + 1})")
+            print(f"[INFO] {len(urls)} URLs d'épisodes récupérées depuis webtoon_data (batch {batch_number})")
             yield urls
 
     except Exception as e:
         print(f"[ERREUR] Erreur lors de la récupération des URLs depuis webtoon_data : {e}")
 
-# Fonction pour récupérer les commentaires d'un épisode de manière synchrone
-def fetch_episode_comments(episode_url, comment_limit=50, reply_limit=5):
-    driver = init_driver()
-    if not driver:
-        print(f"[ERREUR] Impossible d'initialiser le driver pour {episode_url}")
-        return []
+# Widget de commentaires chargé : au moins un commentaire, ou sa liste / son message "aucun commentaire"
+# quand l'épisode n'en a pas. Un délai dépassé sur ce sélecteur signifie que le widget n'a pas chargé.
+COMMENT_WIDGET_LOADED_SELECTOR = 'li.wcc_CommentItem__root, [class*="wcc_CommentList__"], [class*="wcc_Empty"]'
 
-    driver.get(episode_url)
-    accept_cookies(driver)
+# Script exécuté dans la page : lit tous les commentaires et leurs réponses en un seul aller-retour
+# WebDriver au lieu d'un appel distant par champ. arguments : comment_limit, reply_limit (null = tous).
+EXTRACT_COMMENTS_SCRIPT = """
+    const [commentLimit, replyLimit] = arguments;
+    const text = (node, selector) => {
+        const element = node.querySelector(selector);
+        return element ? element.innerText.trim() : '';
+    };
+    // Date lisible par machine (attribut datetime) si elle est fournie, sinon texte affiché
+    const date = node => {
+        const element = node.querySelector('time.wcc_CommentHeader__createdAt');
+        return element ? (element.getAttribute('datetime') || element.innerText).trim() : '';
+    };
+    const limit = (items, n) => n === null ? items : items.slice(0, n);
+    const comments = limit(Array.from(document.querySelectorAll('li.wcc_CommentItem__root')), commentLimit);
+    return comments.map(comment => {
+        const reactions = comment.querySelectorAll('button.wcc_CommentReaction__action > span');
+        const replies = replyLimit === 0 ? [] : limit(Array.from(comment.querySelectorAll('li.wcc_CommentItem__replied')), replyLimit);
+        return {
+            username: text(comment, 'span.wcc_CommentHeader__name'),
+            date: date(comment),
+            content: text(comment, 'p.wcc_TextContent__content > span'),
+            likes: reactions[0] ? reactions[0].innerText.trim() : '',
+            dislikes: reactions[1] ? reactions[1].innerText.trim() : '',
+            replies: replies.map(reply => ({
+                username: text(reply, 'span.wcc_CommentHeader__name'),
+                date: date(reply),
+                content: text(reply, 'p.wcc_TextContent__content > span'),
+            })),
+        };
+    });
+"""
 
+# Extraire les commentaires de l'épisode chargé dans le navigateur : [] si le widget est chargé
+# mais vide (épisode sans commentaire), None en cas d'échec (widget absent, erreur WebDriver)
+def extract_comments(driver, episode_url, comment_limit=50, reply_limit=5):
     comments = []
     try:
         WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'li.wcc_CommentItem__root'))
+            EC.presence_of_element_located((By.CSS_SELECTOR, COMMENT_WIDGET_LOADED_SELECTOR))
         )
-        
-        comment_elements = driver.find_elements(By.CSS_SELECTOR, 'li.wcc_CommentItem__root')[:comment_limit]
-        
-        for i, comment_element in enumerate(comment_elements):
-            username = comment_element.find_element(By.CSS_SELECTOR, 'span.wcc_CommentHeader__name').text.strip()
-            date = comment_element.find_element(By.CSS_SELECTOR, 'time.wcc_CommentHeader__createdAt').text.strip()
-            content = comment_element.find_element(By.CSS_SELECTOR, 'p.wcc_TextContent__content > span').text.strip()
-            likes = int(comment_element.find_elements(By.CSS_SELECTOR, 'button.wcc_CommentReaction__action > span')[0].text.strip() or 0)
-            dislikes = int(comment_element.find_elements(By.CSS_SELECTOR, 'button.wcc_CommentReaction__action > span')[1].text.strip() or 0)
-
-            comment_data = {
-                'username': username,
-                'date': date,
-                'content': content,
-                'likes': likes,
-                'dislikes': dislikes,
-                'replies': []
-            }
-
-            if reply_limit > 0:
-                try:
-                    reply_elements = comment_element.find_elements(By.CSS_SELECTOR, 'li.wcc_CommentItem__replied')[:reply_limit]
-                    for reply_element in reply_elements:
-                        reply_username = reply_element.find_element(By.CSS_SELECTOR, 'span.wcc_CommentHeader__name').text.strip()
-                        reply_date = reply_element.find_element(By.CSS_SELECTOR, 'time.wcc_CommentHeader__createdAt').text.strip()
-                        reply_content = reply_element.find_element(By.CSS_SELECTOR, 'p.wcc_TextContent__content > span').text.strip()
-                        comment_data['replies'].append({
-                            'username': reply_username,
-                            'date': reply_date,
-                            'content': reply_content
-                        })
-                except Exception as e:
-                    print(f"[INFO] Erreur lors de la récupération des réponses pour un commentaire : {e}")
 
+        for comment_data in driver.execute_script(EXTRACT_COMMENTS_SCRIPT, comment_limit, reply_limit):
+            # Compteurs affichés ("1,2K", "1.234") convertis comme ceux des pages webtoon
+            comment_data['likes'] = parse_count(comment_data['likes'], 0)
+            comment_data['dislikes'] = parse_count(comment_data['dislikes'], 0)
+            # Dates au format AAAA-MM-JJ, comme celles de l'API de commentaires
+            comment_data['date'] = format_display_date(comment_data['date'])
+            for reply in comment_data['replies']:
+                reply['date'] = format_display_date(reply['date'])
             comments.append(comment_data)
 
-        print(f"[INFO] Récupération terminée pour {episode_url}")
+        print(f"[INFO] Récupération terminée pour {episode_url} ({len(comments)} commentaire(s))")
     
     except Exception as e:
         print(f"[ERREUR] Erreur lors de la récupération des commentaires pour {episode_url} : {e}")
-    
-    finally:
-        driver.quit()
-    
+        return None
+
     return comments
 
+# Fonction pour récupérer les commentaires d'un épisode de manière synchrone (None en cas d'échec).
+# Avec un pool, la session est empruntée puis rendue au lieu d'ouvrir un navigateur par épisode.
+def fetch_episode_comments(episode_url, comment_limit=50, reply_limit=5, driver_pool=None):
+    if driver_pool is None:
+        driver = init_driver()
+        if not driver:
+            print(f"[ERREUR] Impossible d'initialiser le driver pour {episode_url}")
+            return None
+        try:
+            driver.get(episode_url)
+            accept_cookies(driver)
+            return extract_comments(driver, episode_url, comment_limit, reply_limit)
+        finally:
+            driver.quit()
+
+    try:
+        with driver_pool.session(timeout=SELENIUM_ACQUIRE_TIMEOUT) as driver:
+            driver.get(episode_url)
+            driver_pool.prepare(driver)
+            return extract_comments(driver, episode_url, comment_limit, reply_limit)
+    except Exception as e:
+        print(f"[ERREUR] Session Selenium indisponible pour {episode_url} : {e}")
+        return None
+
+# File de travail continue : les épisodes sont lus par lot dans MongoDB et distribués au fil de l'eau
+# aux workers API ; les épisodes non servis par l'API passent par une file Selenium bornée à la capacité
+# de la grille. Les résultats sont écrits par un writer unique qui regroupe les mises à jour.
+class CommentPipeline:
+    def __init__(self, api_client, driver_pool, comment_limit=50, reply_limit=5, workers=COMMENT_WORKERS, queue_size=COMMENT_QUEUE_SIZE):
+        self.api_client = api_client
+        self.driver_pool = driver_pool
+        self.comment_limit = comment_limit
+        self.reply_limit = reply_limit
+        self.workers = workers
+        self.episode_queue = asyncio.Queue(maxsize=queue_size)
+        # Une place par session Selenium : pas plus d'épisodes en attente que la grille ne peut en servir
+        self.selenium_queue = asyncio.Queue(maxsize=workers["selenium"])
+        self.sink_queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers["selenium"])
+        self.buffer = []
+        self.tasks = []
+        self.pending_writes = set()
+        # episode_url -> {"published_at", "content_hash", "first_fetched"} des épisodes en cours de traitement
+        self.known = {}
+        self.stats = {"skipped": 0, "api": 0, "selenium": 0, "timeouts": 0, "failed": 0, "unchanged": 0, "written": 0, "write_failed": 0}
+
+    async def run(self, batch_size):
+        self._start_stage(self.workers["api"], self.episode_queue, self.fetch_from_api)
+        self._start_stage(self.workers["selenium"], self.selenium_queue, self.fetch_with_selenium)
+        self.tasks.append(asyncio.create_task(self._sink_worker()))
+
+        try:
+            # Alimenter la file au fur et à mesure : put() attend dès que la file est pleine
+            episode_batches = get_episode_urls(batch_size)
+            while True:
+                episodes = await asyncio.to_thread(next, episode_batches, None)
+                if episodes is None:
+                    break
+                for episode_url in await asyncio.to_thread(self.select_due_episodes, episodes):
+                    await self.episode_queue.put(episode_url)
+
+            for queue in (self.episode_queue, self.selenium_queue, self.sink_queue):
+                await queue.join()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            await self._flush()
+            # Écritures lancées par le writer avant son arrêt
+            await asyncio.gather(*self.pending_writes)
+            self.executor.shutdown(wait=False)
+        print(f"[INFO] Commentaires : {self.stats['skipped']} épisode(s) pas encore à revisiter, {self.stats['api']} via l'API, {self.stats['selenium']} via Selenium, "
+              f"{self.stats['timeouts']} délai(s) dépassé(s), {self.stats['failed']} échec(s), {self.stats['unchanged']} inchangé(s), {self.stats['written']} écrit(s), {self.stats['write_failed']} écriture(s) en échec.")
+
+    # Une seule requête indexée par lot : écarter les épisodes dont la prochaine collecte n'est pas due
+    # et mémoriser la date de publication et l'empreinte des autres pour l'écriture
+    def select_due_episodes(self, episodes):
+        now = datetime.now()
+        published = dict(episodes)
+        stored = {}
+        projection = {"_id": 0, "episode_url": 1, "next_fetch_at": 1, "content_hash": 1, "first_fetched": 1}
+        for doc in comments_collection.find({"episode_url": {"$in": list(published)}}, projection):
+            stored[doc["episode_url"]] = doc
+        due = []
+        for episode_url, published_at in published.items():
+            doc = stored.get(episode_url, {})
+            next_fetch_at = doc.get("next_fetch_at")
+            if next_fetch_at is not None and next_fetch_at > now:
+                self.stats["skipped"] += 1
+                continue
+            self.known[episode_url] = {"published_at": published_at, "content_hash": doc.get("content_hash"), "first_fetched": doc.get("first_fetched")}
+            due.append(episode_url)
+        return due
+
+    def _start_stage(self, count, queue, handler):
+        for _ in range(count):
+            self.tasks.append(asyncio.create_task(self._worker(queue, handler)))
+
+    async def _worker(self, queue, handler):
+        while True:
+            episode_url = await queue.get()
+            try:
+                await handler(episode_url)
+            except asyncio.TimeoutError:
+                self.known.pop(episode_url, None)
+                self.stats["timeouts"] += 1
+                print(f"[ERREUR] Délai de {COMMENT_TASK_TIMEOUT}s dépassé pour {episode_url} ({handler.__name__}), épisode ignoré.")
+            except Exception as e:
+                self.known.pop(episode_url, None)
+                self.stats["failed"] += 1
+                print(f"[ERREUR] Erreur lors de la récupération des commentaires pour {episode_url} : {e}")
+            finally:
+                queue.task_done()
+
+    # API JSON en priorité, repli sur Selenium si elle ne peut pas servir l'épisode
+    async def fetch_from_api(self, episode_url):
+        comments = None
+        if self.api_client is not None:
+            comments = await asyncio.wait_for(
+                self.api_client.fetch_episode_comments(episode_url, self.comment_limit, self.reply_limit),
+                timeout=COMMENT_TASK_TIMEOUT
+            )
+        if comments is None:
+            if self.api_client is not None:
+                print(f"[INFO] API de commentaires indisponible pour {episode_url}, repli sur Selenium.")
+            await self.selenium_queue.put(episode_url)
+            return
+        self.stats["api"] += 1
+        await self.sink_queue.put((episode_url, comments))
+
+    # Le thread Selenium n'est pas interrompu au-delà du délai, mais le worker passe à l'épisode suivant
+    # (le chargement de page est lui-même borné par SELENIUM_PAGE_LOAD_TIMEOUT)
+    # Un échec ne produit aucune écriture : les commentaires déjà stockés et `next_fetch_at` sont
+    # conservés, l'épisode sera retenté à la prochaine exécution.
+    async def fetch_with_selenium(self, episode_url):
+        loop = asyncio.get_running_loop()
+        comments = await asyncio.wait_for(
+            loop.run_in_executor(self.executor, fetch_episode_comments, episode_url, self.comment_limit, self.reply_limit, self.driver_pool),
+            timeout=COMMENT_TASK_TIMEOUT
+        )
+        if comments is None:
+            self.known.pop(episode_url, None)
+            self.stats["failed"] += 1
+            print(f"[ERREUR] Commentaires non récupérés pour {episode_url}, données existantes conservées.")
+            return
+        self.stats["selenium"] += 1
+        await self.sink_queue.put((episode_url, comments))
+
+    # Regrouper les mises à jour et les écrire par batch (taille atteinte ou délai écoulé)
+    async def _sink_worker(self):
+        while True:
+            try:
+                episode_url, comments = await asyncio.wait_for(self.sink_queue.get(), timeout=SINK_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                await self._flush()
+                continue
+            self.buffer.append(self._comment_update(episode_url, comments))
+            # Acquitté dès la mise en tampon : une écriture en échec ne bloque pas `run()` sur sink_queue.join()
+            self.sink_queue.task_done()
+            if len(self.buffer) >= COMMENT_WRITE_BATCH_SIZE:
+                await self._flush()
+
+    # Mise à jour de suivi : les commentaires et `last_update` ne sont réécrits que si le contenu a changé
+    def _comment_update(self, episode_url, comments):
+        now = datetime.now()
+        known = self.known.pop(episode_url, {})
+        content_hash = hash_comments(comments)
+        published_at = known.get("published_at") or known.get("first_fetched") or now
+        fields = {
+            "last_fetched": now,
+            "comment_count": len(comments),
+            "content_hash": content_hash,
+            "next_fetch_at": now + revisit_interval(now - published_at) - COMMENT_REVISIT_SLACK,
+        }
+        if content_hash != known.get("content_hash"):
+            fields.update(comments=comments, last_update=now)
+        else:
+            self.stats["unchanged"] += 1
+        return UpdateOne({"episode_url": episode_url}, {"$set": fields, "$setOnInsert": {"first_fetched": now}}, upsert=True)
+
+    # Écrire le tampon ; l'écriture est protégée de l'annulation du writer et attendue en fin de `run()`
+    async def _flush(self):
+        if not self.buffer:
+            return
+        bulk_operations, self.buffer = self.buffer, []
+        task = asyncio.create_task(self._write(bulk_operations))
+        self.pending_writes.add(task)
+        task.add_done_callback(self.pending_writes.discard)
+        await asyncio.shield(task)
+
+    # Une erreur MongoDB (batch partiel, connexion perdue...) est comptée et le writer continue :
+    # les épisodes non écrits gardent leur `next_fetch_at` et seront retentés à la prochaine exécution
+    async def _write(self, bulk_operations):
+        try:
+            await asyncio.to_thread(comments_collection.bulk_write, bulk_operations, ordered=False)
+            self.stats["written"] += len(bulk_operations)
+            print(f"[INFO] Batch de {len(bulk_operations)} opérations de mise à jour exécuté dans MongoDB.")
+        except BulkWriteError as e:
+            failed = len(e.details.get("writeErrors", []))
+            self.stats["written"] += len(bulk_operations) - failed
+            self.stats["write_failed"] += failed
+            print(f"[ERREUR] Erreur lors de la mise à jour en batch MongoDB : {failed} échec(s).")
+        except PyMongoError as e:
+            self.stats["write_failed"] += len(bulk_operations)
+            print(f"[ERREUR] Écriture de {len(bulk_operations)} mise(s) à jour de commentaires impossible : {e}")
+
+async def fetch_comments_for_all_episodes_async(batch_size, comment_limit=50, reply_limit=5):
+    ensure_indexes()
+    # Le pool n'ouvre de session Chrome qu'au premier repli sur Selenium
+    driver_pool = DriverPool(init_driver, SELENIUM_POOL_SIZE, SELENIUM_MAX_PAGES_PER_SESSION, on_first_page=accept_cookies)
+    try:
+        async with create_comment_session() as session:
+            api_client = CommentApiClient(session) if USE_COMMENT_API else None
+            pipeline = CommentPipeline(api_client, driver_pool, comment_limit, reply_limit)
+            await pipeline.run(batch_size)
+            if api_client is not None:
+                api_client.rate_limiter.report()
+    finally:
+        driver_pool.close()
+
 # Fonction pour récupérer les commentaires pour tous les épisodes en parallèle
+# (comment_limit / reply_limit à None : tous les commentaires et toutes les réponses)
 def fetch_comments_for_all_episodes(batch_size, comment_limit=50, reply_limit=5):
-    with ThreadPoolExecutor() as executor:
-        for episode_urls in get_episode_urls(batch_size):
-            futures = {executor.submit(fetch_episode_comments, url, comment_limit, reply_limit): url for url in episode_urls}
-            
-            bulk_operations = []
-            for future in as_completed(futures):
-                episode_url = futures[future]
-                try:
-                    comments = future.result()
-                    bulk_operations.append(UpdateOne(
-                        {"episode_url": episode_url},
-                        {"$set": {"comments": comments, "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}},
-                        upsert=True
-                    ))
-                except Exception as e:
-                    print(f"[ERREUR] Erreur lors de la récupération des commentaires pour {episode_url} : {e}")
-
-            if bulk_operations:
-                try:
-                    comments_collection.bulk_write(bulk_operations, ordered=False)
-                    print(f"[INFO] Batch de {len(bulk_operations)} opérations de mise à jour exécuté dans MongoDB.")
-                except BulkWriteError as e:
-                    print(f"[ERREUR] Erreur lors de la mise à jour en batch MongoDB : {e.details}")
-
-# Fonction pour transférer les données vers HDFS
+    asyncio.run(fetch_comments_for_all_episodes_async(batch_size, comment_limit, reply_limit))
+
+# Fonction pour transférer vers HDFS les commentaires modifiés depuis le dernier export.
+# Chaque export ajoute des fichiers gzip de taille bornée, écrits en parallèle et validés par un
+# manifeste dans `HDFS_DIR/webtoon_comments/_manifests/` ; les exports précédents ne sont jamais réécrits.
 async def transfer_updated_comments_to_hdfs(batch_size):
     if not USE_HDFS:
         print("[INFO] Le transfert vers HDFS est désactivé.")
         return
-    
-    hdfs_file_path = f"{HDFS_DIR}/webtoon_comments.json"
-    temp_hdfs_file_path = f"{HDFS_DIR}/webtoon_comments_temp.json"
-    
+
     try:
-        today = datetime.today().strftime("%Y-%m-%d")
-        total_docs = comments_collection.count_documents({"last_updated": {"$regex": today}})
-        
-        latest_updates = {}
-        for start in range(0, total_docs, batch_size):
-            docs_batch = list(comments_collection.find({"last_updated": {"$regex": today}}).skip(start).limit(batch_size))
-            for doc in docs_batch:
-                doc["_id"] = str(doc["_id"])
-                episode_url = doc["episode_url"]
-                
-                if episode_url not in latest_updates or doc["last_updated"] > latest_updates[episode_url]["last_updated"]:
-                    latest_updates[episode_url] = doc
-        
-        # Ecrit les mises à jour dans un fichier temporaire pour gérer les doublons
-        with hdfs_client.write(temp_hdfs_file_path, encoding='utf-8', overwrite=True) as writer:
-            if hdfs_client.status(hdfs_file_path, strict=False):
-                with hdfs_client.read(hdfs_file_path, encoding='utf-8') as reader:
-                    for line in reader:
-                        existing_doc = json.loads(line.strip())
-                        episode_url = existing_doc["episode_url"]
-                        
-                        if episode_url in latest_updates:
-                            writer.write(json.dumps(latest_updates[episode_url]) + "\n")
-                            latest_updates.pop(episode_url)
-                        else:
-                            writer.write(json.dumps(existing_doc) + "\n")
-            
-            for new_doc in latest_updates.values():
-                writer.write(json.dumps(new_doc) + "\n")
-        
-        hdfs_client.delete(hdfs_file_path)
-        hdfs_client.rename(temp_hdfs_file_path, hdfs_file_path)
+        high_water_mark = to_datetime(load_high_water_mark(db, HDFS_DATASET))
+        query = {"last_update": {"$gt": high_water_mark}} if high_water_mark else {}
+        if comments_collection.count_documents(query, limit=1) == 0:
+            print("[INFO] Aucun commentaire modifié depuis le dernier export HDFS.")
+            return
 
-        print(f"[INFO] Transfert vers HDFS terminé. Données mises à jour dans {hdfs_file_path}.")
+        new_high_water_mark = high_water_mark
+        def changed_docs():
+            nonlocal new_high_water_mark
+            for doc in stream_documents(comments_collection, query, batch_size=batch_size, sort_field="last_update"):
+                last_update = to_datetime(doc.get("last_update"))
+                if last_update and (new_high_water_mark is None or last_update > new_high_water_mark):
+                    new_high_water_mark = last_update
+                yield doc
+
+        count, path = await asyncio.to_thread(
+            export_chunked_segment, hdfs_client, HDFS_DIR, HDFS_DATASET, changed_docs(), HDFS_EXPORT_FORMAT, flatten_comments, COMMENT_SCHEMAS
+        )
+        # Le point de reprise n'avance qu'une fois le manifeste validé
+        save_high_water_mark(db, HDFS_DATASET, new_high_water_mark)
+        print(f"[INFO] Transfert vers HDFS terminé. {count} document(s) de commentaires exporté(s), manifeste {path}.")
 
     except Exception as e:
         print(f"[ERREUR] Erreur lors du transfert des données vers HDFS : {e}")
 
 # Appel principal
 if __name__ == "__main__":
-    fetch_comments_for_all_episodes(batch_size=1, comment_limit=5, reply_limit=5)
+    fetch_comments_for_all_episodes(batch_size=1, comment_limit=None, reply_limit=None)
 
 
@@ -7,48 +7,24 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer
-from pymongo import MongoClient
-from hdfs import InsecureClient
+import os
+import sys
+
+# Construction des features partagée avec IA/prediction.py, modules communs avec le scraping dans app/
+for directory in ("IA", "app"):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), directory))
+from features import build_text_features
+from data_loader import load_dataset
 
 # Définir la source de données ("mongo" ou "hdfs")
 source = "hdfs"  # Remplacez par "hdfs" pour utiliser HDFS
 
-# Charger les données depuis MongoDB
-def load_data_from_mongo():
-    MONGO_URI = "mongodb://mongodb:27017"
-    client = MongoClient(MONGO_URI)
-    db = client["webtoons"]
-    collection = db["webtoon_data"]
-    data = list(collection.find({}, {"views": 1, "subscribers": 1, "episodes.like_count": 1, "rating": 1}))
-    return pd.DataFrame(data)
-
-# Charger les données depuis HDFS
-def load_data_from_hdfs():
-    hdfs_client = InsecureClient("http://namenode:9870", user="hdfs")
-    with hdfs_client.read("/webtoons_data/webtoon_data.json", encoding="utf-8") as reader:
-        data = pd.read_json(reader, lines=True)  # Activer la lecture ligne par ligne pour JSON en lignes
-    return data
-
-# Sélectionner la source de données
-if source == "mongo":
-    df = load_data_from_mongo()
-elif source == "hdfs":
-    df = load_data_from_hdfs()
-else:
-    raise ValueError("Source de données non valide. Utilisez 'mongo' ou 'hdfs'.")
-
-# Créer une colonne binaire pour la présence de qr_code
-df["has_qr_code"] = df["qr_code"].apply(lambda x: 1 if x else 0)
-
-# Combiner les titres des épisodes et descriptions des auteurs en une seule chaîne par webtoon
-df["episode_titles"] = df["episodes"].apply(lambda x: " ".join([ep["episode_title"] for ep in x]) if x else "")
-df["author_description"] = df["authors"].apply(lambda authors: " ".join([author.get("description", "") for author in authors]) if authors else "")
+# Charger uniquement les colonnes utiles, par morceaux, en gardant la version la plus récente de chaque webtoon
+df = load_dataset(source, ["summary", "genre", "title", "authors", "qr_code", "rating"])
 
-# Remplir les valeurs manquantes par des valeurs par défaut
-df["genre"] = df["genre"].fillna("")
-df["summary"] = df["summary"].fillna("")
-df["author_description"] = df["author_description"].fillna("")
-df["title"] = df["title"].fillna("")
+# Features textuelles (descriptions d'auteurs concaténées, valeurs manquantes remplacées par ""),
+# présence du QR code et note convertie en nombre
+df = build_text_features(df)
 
 # Sélection des features et de la cible
 X = df[["summary", "author_description", "genre", "title", "has_qr_code"]]